@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import Post, Group, Comment, Follow
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from . import querylog
+from .models import Post, Group, Comment, Follow, Job, SlowQuery
+from .search import build_match, matching_ids_sql
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -8,6 +13,15 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту через индекс FTS5 вместо LIKE '%...%'.
+        match = build_match(search_term)
+        if match is None or connection.vendor != "sqlite":
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        return queryset.filter(
+            pk__in=RawSQL(matching_ids_sql(), [match])), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("pk", "title", "description")
@@ -26,7 +40,32 @@ class FollowAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("pk", "name", "status", "attempts", "run_at",
+                    "locked_by", "last_error")
+    list_filter = ("status", "name")
+    empty_value_display = "-пусто-"
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ("sql", "calls", "total_time", "max_time", "last_view",
+                    "last_seen")
+    list_filter = ("last_view",)
+    readonly_fields = ("fingerprint", "sql", "calls", "total_time",
+                       "max_time", "last_params", "last_view", "plan",
+                       "last_seen")
+    empty_value_display = "-пусто-"
+
+    def get_queryset(self, request):
+        return querylog.top_queries()
+
+    def has_add_permission(self, request):
+        return False
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(Job, JobAdmin)
+admin.site.register(SlowQuery, SlowQueryAdmin)
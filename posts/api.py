@@ -0,0 +1,179 @@
+"""JSON API только для чтения.
+
+Ответы собираются из строк ``.values()`` без создания моделей и без
+шаблонов; страницы — курсорные, как в HTML-лентах.
+"""
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from .follow_feed import feed_source
+from .models import Comment, Group, Post, TimelineEntry, User
+from .pagination import KeysetPaginator, encode_key
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Поле ответа -> путь для .values().
+POST_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "pub_date": "pub_date",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+    "comment_count": "comment_count",
+}
+# Лента подписок читается из TimelineEntry: дата и автор уже в записи.
+TIMELINE_FIELDS = {
+    "id": "post_id",
+    "text": "post__text",
+    "pub_date": "pub_date",
+    "author": "author__username",
+    "group": "post__group__slug",
+    "image": "post__image",
+    "comment_count": "post__comment_count",
+}
+COMMENT_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "created": "created",
+    "author": "author__username",
+}
+
+image_storage = Post._meta.get_field("image").storage
+
+
+class RowPaginator(KeysetPaginator):
+    """Курсорный паджинатор по словарям из .values()."""
+
+    def cursor_for(self, row):
+        return encode_key(row[self.date_field], row[self.id_field])
+
+
+class TimelineRowPaginator(RowPaginator):
+    ordering = ("-pub_date", "-post_id")
+
+
+class CommentRowPaginator(RowPaginator):
+    ordering = ("-created", "-id")
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={
+        "ensure_ascii": False, "separators": (",", ":")})
+
+
+def _error(detail, status):
+    return _json({"detail": detail}, status)
+
+
+def _selected(request, fields):
+    """Поля из ?fields=a,b; None, если запрошено неизвестное поле."""
+    names = request.GET.get("fields")
+    if not names:
+        return list(fields)
+    names = [name.strip() for name in names.split(",") if name.strip()]
+    if not names or any(name not in fields for name in names):
+        return None
+    return names
+
+
+def _per_page(request):
+    try:
+        limit = int(request.GET.get("limit", PAGE_SIZE))
+    except ValueError:
+        return PAGE_SIZE
+    return min(max(limit, 1), MAX_PAGE_SIZE)
+
+
+def _serialize(row, fields, names):
+    data = {name: row[fields[name]] for name in names}
+    if data.get("image"):
+        data["image"] = image_storage.url(data["image"])
+    elif "image" in data:
+        data["image"] = None
+    return data
+
+
+def _rows(queryset, fields, names, paginator_class=RowPaginator,
+          per_page=PAGE_SIZE, after=None, before=None):
+    """Страница строк: для курсора в выборку всегда входят поля ключа."""
+    key = [field.lstrip("-") for field in paginator_class.ordering]
+    paths = {fields[name] for name in names} | set(key)
+    paginator = paginator_class(queryset.values(*paths), per_page)
+    page = paginator.get_page(after=after, before=before)
+    return {
+        "results": [_serialize(row, fields, names) for row in page],
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    }
+
+
+def _feed(request, queryset, fields=POST_FIELDS,
+          paginator_class=RowPaginator):
+    names = _selected(request, fields)
+    if names is None:
+        return _error("Неизвестное поле в fields", 400)
+    return _json(_rows(queryset, fields, names, paginator_class,
+                       per_page=_per_page(request),
+                       after=request.GET.get("after"),
+                       before=request.GET.get("before")))
+
+
+@require_safe
+def posts(request):
+    return _feed(request, Post.objects.all())
+
+
+@require_safe
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        "pk", flat=True).first()
+    if group_id is None:
+        return _error("Группа не найдена", 404)
+    return _feed(request, Post.objects.filter(group_id=group_id))
+
+
+@require_safe
+def author_posts(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        "pk", flat=True).first()
+    if author_id is None:
+        return _error("Автор не найден", 404)
+    return _feed(request, Post.objects.filter(author_id=author_id))
+
+
+@require_safe
+def follow(request):
+    if not request.user.is_authenticated:
+        return _error("Требуется вход", 401)
+    if feed_source() == "timeline":
+        return _feed(request,
+                     TimelineEntry.objects.filter(user_id=request.user.pk),
+                     TIMELINE_FIELDS, TimelineRowPaginator)
+    return _feed(request, Post.objects.filter(
+        author__following__user_id=request.user.pk))
+
+
+@require_safe
+def post_detail(request, post_id):
+    names = _selected(request, POST_FIELDS)
+    if names is None:
+        return _error("Неизвестное поле в fields", 400)
+    row = Post.objects.filter(pk=post_id).values(
+        *{POST_FIELDS[name] for name in names}).first()
+    if row is None:
+        return _error("Пост не найден", 404)
+    data = _serialize(row, POST_FIELDS, names)
+    data["comments"] = _rows(Comment.objects.filter(post_id=post_id),
+                             COMMENT_FIELDS, list(COMMENT_FIELDS),
+                             CommentRowPaginator)
+    return _json(data)
+
+
+@require_safe
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return _error("Пост не найден", 404)
+    return _feed(request, Comment.objects.filter(post_id=post_id),
+                 COMMENT_FIELDS, CommentRowPaginator)
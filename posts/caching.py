@@ -0,0 +1,162 @@
+import math
+import random
+import time
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+FEED_VERSION_KEY = "feed:version"
+# Фрагменты ленты живут долго: актуальность обеспечивает версия.
+FEED_TIMEOUT = 60 * 10
+
+
+def feed_version():
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        # Начинаем с метки времени, чтобы после вытеснения ключа версия
+        # не совпала ни с одной из уже закэшированных.
+        version = int(time.time() * 1000)
+        cache.add(FEED_VERSION_KEY, version, None)
+        version = cache.get(FEED_VERSION_KEY, version)
+    return version
+
+
+def bump_feed_version():
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        feed_version()
+
+
+def page_cache_key(request):
+    """Часть ключа кэша, однозначно задающая страницу ленты."""
+    return "|".join(request.GET.get(name, "")
+                    for name in ("page", "after", "before"))
+
+
+# Ключ карточки меняется вместе с Post.modified, поэтому TTL большой.
+CARD_TIMEOUT = 60 * 60
+
+
+def card_cache_key(post):
+    return f"post_card:{post.pk}:{post.modified.timestamp()}"
+
+
+# Версии областей ("all", "group:<id>", "author:<id>", "post:<id>",
+# "follow:<user_id>"; "list:all" и "list:group:<id>" — только состав лент,
+# "stats:<user_id>" — только счётчики профиля)
+# для валидаторов условных GET и тегов кэша страниц. Значение — время
+# последнего изменения в микросекундах, из него же берётся Last-Modified.
+SITE_SCOPE = "site"
+
+
+def scope_key(scope):
+    return f"version:{scope}"
+
+
+def scope_versions(scopes):
+    """Версии областей в порядке scopes одним обращением к кэшу."""
+    keys = [scope_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # Потерянная версия начинается заново с текущего момента.
+        now = time.time_ns() // 1000
+        for key in missing:
+            cache.add(key, now, None)
+        found.update(cache.get_many(missing))
+    return [found.get(key, 0) for key in keys]
+
+
+def bump_scopes(*scopes):
+    def bump():
+        now = time.time_ns() // 1000
+        cache.set_many({scope_key(scope): now for scope in scopes}, None)
+
+    bump()
+    if connection.in_atomic_block:
+        # Запрос между первой сменой версии и коммитом мог сохранить
+        # новую версию вместе со старыми данными.
+        transaction.on_commit(bump)
+
+
+def post_scopes(post_id, author_id, group_id=None):
+    scopes = ["all", f"post:{post_id}", f"author:{author_id}"]
+    if group_id is not None:
+        scopes.append(f"group:{group_id}")
+    return scopes
+
+
+# Защита от лавины пересчётов в fetch.
+# Чем больше beta, тем раньше до истечения начинается пересчёт.
+EARLY_BETA = 1.0
+# Сколько после истечения хранится устаревшее значение для остальных.
+STALE_TIMEOUT = 60 * 5
+LOCK_TIMEOUT = 30
+# Сколько ждать чужого пересчёта, когда отдать нечего.
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+
+_stale_reads = ContextVar("stale_reads", default=0)
+
+
+def stale_reads():
+    """Сколько устаревших значений fetch отдал в текущем потоке."""
+    return _stale_reads.get()
+
+
+def lock_key(key):
+    return f"{key}:lock"
+
+
+def _is_fresh(entry, version):
+    _, entry_version, expires, delta = entry
+    if entry_version != version:
+        return False
+    # Вероятностное раннее истечение: чем дороже пересчёт и ближе срок,
+    # тем вероятнее, что этот запрос возьмётся за него заранее.
+    early = delta * EARLY_BETA * math.log(1.0 - random.random())
+    return time.time() - early < expires
+
+
+def fetch(key, compute, timeout, version=None):
+    """Значение из кэша с защитой от одновременного пересчёта.
+
+    Запись хранится дольше timeout: когда срок вышел или сменилась
+    version, пересчитывает один запрос (под блокировкой), остальные
+    получают прежнее значение. Без записи остальные ждут до LOCK_WAIT.
+    """
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, version):
+        return entry[0]
+    locked = cache.add(lock_key(key), 1, LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            _stale_reads.set(_stale_reads.get() + 1)
+            return entry[0]
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL)
+            entry = cache.get(key)
+            if entry is not None and entry[1] == version:
+                return entry[0]
+    try:
+        started = time.time()
+        value = compute()
+        finished = time.time()
+        cache.set(key, (value, version, finished + timeout,
+                        finished - started), timeout + STALE_TIMEOUT)
+    finally:
+        if locked:
+            cache.delete(lock_key(key))
+    return value
+
+
+def expire(*keys):
+    """Пометить записи fetch устаревшими, сохранив значения для отдачи."""
+    entries = cache.get_many(keys)
+    cache.set_many({
+        key: (value, version, 0, delta)
+        for key, (value, version, _, delta) in entries.items()
+    }, STALE_TIMEOUT)
@@ -0,0 +1,112 @@
+"""Условные GET для HTML-страниц.
+
+Валидаторы собираются из версий областей в кэше (caching.scope_versions)
+и пары дешёвых запросов по уникальным индексам, поэтому ответ 304
+отдаётся раньше основных запросов и шаблонов.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .caching import SITE_SCOPE, scope_versions, stale_reads
+from .follow_feed import followed_author_ids
+from .models import Group, User
+
+
+def _author_id(username):
+    return User.objects.filter(username=username).values_list(
+        "pk", flat=True).first()
+
+
+def index_scopes(request):
+    return ["all"]
+
+
+def group_scopes(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        "pk", flat=True).first()
+    if group_id is None:
+        return None
+    return [f"group:{group_id}"]
+
+
+def profile_scopes(request, username):
+    author_id = _author_id(username)
+    if author_id is None:
+        return None
+    # Кнопка подписки зависит от того, кто смотрит.
+    return [f"author:{author_id}", f"follow:{request.user.pk}"]
+
+
+def post_scopes(request, username, post_id):
+    author_id = _author_id(username)
+    if author_id is None:
+        return None
+    return [f"post:{post_id}", f"author:{author_id}"]
+
+
+def follow_scopes(request):
+    user_id = request.user.pk
+    return [f"follow:{user_id}"] + [
+        f"author:{author_id}" for author_id in followed_author_ids(user_id)]
+
+
+def _validators(request, scopes_for, args, kwargs):
+    """(ETag, Last-Modified) страницы; считается один раз на запрос."""
+    if not hasattr(request, "_validators"):
+        scopes = scopes_for(request, *args, **kwargs)
+        if scopes is None:
+            request._validators = (None, None)
+        else:
+            versions = scope_versions([SITE_SCOPE, *scopes])
+            # Страница зависит и от того, кто её смотрит: шапка и
+            # CSRF-токен в формах.
+            parts = [request.get_full_path(), str(request.user.pk),
+                     request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+                     *map(str, versions)]
+            etag = hashlib.md5("|".join(parts).encode()).hexdigest()
+            last_modified = datetime.fromtimestamp(max(versions) / 10 ** 6,
+                                                   timezone.utc)
+            request._validators = (f'"{etag}"', last_modified)
+    return request._validators
+
+
+def conditional(scopes_for):
+    """Отвечает 304 по версиям областей, которые вернул scopes_for.
+
+    scopes_for получает аргументы представления и возвращает список
+    областей или None, если объекта нет (тогда работает само
+    представление).
+    """
+    def etag(request, *args, **kwargs):
+        return _validators(request, scopes_for, args, kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return _validators(request, scopes_for, args, kwargs)[1]
+
+    def decorator(view):
+        view = condition(etag_func=etag, last_modified_func=last_modified)(
+            view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            stale = stale_reads()
+            response = view(request, *args, **kwargs)
+            if stale_reads() != stale:
+                # В страницу попал устаревший фрагмент: с валидаторами
+                # новой версии клиент хранил бы его до следующей правки.
+                del response["ETag"]
+                del response["Last-Modified"]
+            if request.method in ("GET", "HEAD"):
+                # Без этого браузер сам решит, сколько держать страницу
+                # по эвристике от Last-Modified.
+                patch_cache_control(response, no_cache=True)
+                if request.user.is_authenticated:
+                    patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
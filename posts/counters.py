@@ -0,0 +1,103 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import AuthorStats, Follow, Post, User, comments_count
+
+BATCH_SIZE = 1000
+
+
+def _counts(model, field, user_ids):
+    return dict(model.objects.filter(**{f"{field}__in": user_ids}).order_by(
+        ).values(field).annotate(count=Count("pk")).values_list(field,
+                                                                "count"))
+
+
+def count_author(user_ids):
+    """Фактические значения счётчиков для группы пользователей."""
+    posts = _counts(Post, "author_id", user_ids)
+    followers = _counts(Follow, "author_id", user_ids)
+    following = _counts(Follow, "user_id", user_ids)
+    return {
+        user_id: AuthorStats(user_id=user_id,
+                             posts_count=posts.get(user_id, 0),
+                             followers_count=followers.get(user_id, 0),
+                             following_count=following.get(user_id, 0))
+        for user_id in user_ids
+    }
+
+
+def recount_author(user_id):
+    stats = count_author([user_id])[user_id]
+    try:
+        with transaction.atomic():
+            stats.save(force_insert=True)
+    except IntegrityError:
+        pass
+    return stats
+
+
+def stats_for(user):
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return recount_author(user.pk)
+
+
+def _add(field, delta):
+    return Greatest(F(field) + delta, 0)
+
+
+def bump_author(user_id, **deltas):
+    # Если строки ещё нет, её посчитает stats_for при первом показе.
+    AuthorStats.objects.filter(user_id=user_id).update(
+        **{field: _add(field, delta) for field, delta in deltas.items()})
+
+
+def bump_comments(post_id, delta, modified):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=_add("comment_count", delta), modified=modified)
+
+
+def _id_batches(queryset, batch_size):
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last_id).order_by(
+            "pk").values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def recount_posts(batch_size=BATCH_SIZE):
+    """Исправляет Post.comment_count; возвращает число исправленных."""
+    fixed = 0
+    for ids in _id_batches(Post.objects.all(), batch_size):
+        with transaction.atomic():
+            fixed += Post.objects.filter(pk__in=ids).exclude(
+                comment_count=comments_count()).update(
+                    comment_count=comments_count())
+    return fixed
+
+
+def recount_authors(batch_size=BATCH_SIZE):
+    """Исправляет AuthorStats; возвращает число исправленных строк."""
+    fields = ["posts_count", "followers_count", "following_count"]
+    fixed = 0
+    for ids in _id_batches(User.objects.all(), batch_size):
+        actual = count_author(ids)
+        with transaction.atomic():
+            stored = AuthorStats.objects.select_for_update().in_bulk(ids)
+            changed = [
+                stats for user_id, stats in actual.items()
+                if user_id in stored and any(
+                    getattr(stats, field) != getattr(stored[user_id], field)
+                    for field in fields)
+            ]
+            missing = [stats for user_id, stats in actual.items()
+                       if user_id not in stored]
+            AuthorStats.objects.bulk_update(changed, fields)
+            AuthorStats.objects.bulk_create(missing, ignore_conflicts=True)
+        fixed += len(changed) + len(missing)
+    return fixed
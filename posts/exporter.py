@@ -0,0 +1,116 @@
+"""Потоковая выгрузка постов, комментариев и подписок.
+
+Записи в том же формате, что читает import_yatube. Данные читаются
+пачками по id (keyset) через .values().iterator(), строки сразу уходят
+наружу, так что память не зависит от объёма выгрузки.
+"""
+import csv
+import json
+import zlib
+
+from .models import Comment, Follow, Group, Post
+
+BATCH_SIZE = 2000
+# Столбцы CSV: объединение полей записей всех типов.
+CSV_FIELDS = ["type", "id", "slug", "title", "description", "text",
+              "author", "group", "pub_date", "image", "post", "created",
+              "user"]
+GZIP_BUFFER = 64 * 1024
+
+
+def keyset(queryset, fields, batch_size=BATCH_SIZE):
+    """.values() пачками по pk: без OFFSET и без кэша QuerySet."""
+    last_pk = 0
+    while True:
+        batch = queryset.filter(pk__gt=last_pk).order_by("pk").values(
+            "pk", *fields)[:batch_size]
+        count = 0
+        for row in batch.iterator(chunk_size=batch_size):
+            count += 1
+            yield row
+        if count < batch_size:
+            return
+        last_pk = row["pk"]
+
+
+def _date(value):
+    return value.isoformat() if value else None
+
+
+def export_records(user=None, batch_size=BATCH_SIZE):
+    """Записи выгрузки: всего сайта или только своё для user."""
+    groups = Group.objects.all()
+    posts = Post.objects.all()
+    comments = Comment.objects.all()
+    follows = Follow.objects.all()
+    if user is not None:
+        posts = posts.filter(author=user)
+        groups = groups.filter(pk__in=posts.values("group"))
+        comments = comments.filter(author=user)
+        follows = follows.filter(user=user)
+    for row in keyset(groups, ["slug", "title", "description"], batch_size):
+        yield {"type": "group", "slug": row["slug"], "title": row["title"],
+               "description": row["description"]}
+    for row in keyset(posts, ["text", "author__username", "group__slug",
+                              "pub_date", "image"], batch_size):
+        yield {"type": "post", "id": row["pk"], "text": row["text"],
+               "author": row["author__username"],
+               "group": row["group__slug"],
+               "pub_date": _date(row["pub_date"]),
+               "image": row["image"] or None}
+    for row in keyset(comments, ["post_id", "author__username", "text",
+                                 "created"], batch_size):
+        yield {"type": "comment", "post": row["post_id"],
+               "author": row["author__username"], "text": row["text"],
+               "created": _date(row["created"])}
+    for row in keyset(follows, ["user__username", "author__username"],
+                      batch_size):
+        yield {"type": "follow", "user": row["user__username"],
+               "author": row["author__username"]}
+
+
+def as_jsonl(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class _Line:
+    """csv.writer пишет в него строку и сразу её отдаёт."""
+
+    def write(self, value):
+        return value
+
+
+def as_csv(records):
+    writer = csv.DictWriter(_Line(), CSV_FIELDS)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+FORMATS = {"jsonl": as_jsonl, "csv": as_csv}
+
+
+def gzipped(lines):
+    """gzip на лету; на выход идут куски примерно по GZIP_BUFFER байт."""
+    compressor = zlib.compressobj(wbits=31)  # 31 — формат gzip
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= GZIP_BUFFER:
+            chunk = compressor.compress(b"".join(buffer))
+            buffer, size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b"".join(buffer)) + compressor.flush()
+
+
+def export_stream(user=None, format_="jsonl", gzip=False,
+                  batch_size=BATCH_SIZE):
+    lines = FORMATS[format_](export_records(user, batch_size))
+    if gzip:
+        return gzipped(lines)
+    return (line.encode("utf-8") for line in lines)
@@ -0,0 +1,127 @@
+import heapq
+from itertools import dropwhile, islice
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import fetch
+from .models import Follow, Post
+from .pagination import (PAGE_SIZE, KeysetPaginator, decode_cursor,
+                         paginate)
+from .timeline import (NumberedTimelinePaginator, TimelinePaginator,
+                       timeline_for, timeline_scope)
+
+# Сколько последних постов автора хранится в кэше для сборки ленты.
+RECENT_SIZE = 200
+RECENT_TIMEOUT = 60 * 60
+
+
+def feed_source():
+    return getattr(settings, "FOLLOW_FEED_SOURCE", "timeline")
+
+
+def recent_key(author_id):
+    return f"follow_feed:recent:{author_id}"
+
+
+def following_key(user_id):
+    return f"follow_feed:following:{user_id}"
+
+
+def followed_author_ids(user_id):
+    return fetch(following_key(user_id), lambda: list(Follow.objects.filter(
+        user_id=user_id).values_list("author_id", flat=True)),
+        RECENT_TIMEOUT)
+
+
+def recent_posts(author_ids):
+    """Списки (pub_date, id) последних постов авторов, от новых к старым."""
+    keys = {recent_key(author_id): author_id for author_id in author_ids}
+    found = cache.get_many(keys)
+    missing = {}
+    for key, author_id in keys.items():
+        if key not in found:
+            missing[key] = list(Post.objects.filter(
+                author_id=author_id).order_by(
+                    "-pub_date", "-id").values_list(
+                        "pub_date", "id")[:RECENT_SIZE])
+    if missing:
+        cache.set_many(missing, RECENT_TIMEOUT)
+        found.update(missing)
+    return list(found.values())
+
+
+class PullFeedPaginator(KeysetPaginator):
+    """Лента подписок, собранная слиянием кэшированных списков авторов.
+
+    Если нужная страница глубже, чем хранят кэши, страница строится
+    обычным запросом через родительский KeysetPaginator.
+    """
+
+    def __init__(self, object_list, per_page, author_ids):
+        super().__init__(object_list, per_page)
+        self.author_ids = author_ids
+
+    def get_page(self, after=None, before=None):
+        lists = recent_posts(self.author_ids)
+        # Ниже границы хотя бы один обрезанный список может быть неполным.
+        horizon = max((keys[-1] for keys in lists
+                       if len(keys) >= RECENT_SIZE), default=None)
+        cursor = decode_cursor(after)
+        if cursor is not None:
+            merged = dropwhile(lambda key: key >= cursor,
+                               heapq.merge(*lists, reverse=True))
+            keys = list(islice(merged, self.per_page + 1))
+            if self._complete(keys, horizon):
+                return self._posts_page(keys, has_previous=True)
+            return super().get_page(after=after)
+        cursor = decode_cursor(before)
+        if cursor is not None:
+            newer = [key for key in heapq.merge(*lists, reverse=True)
+                     if key > cursor]
+            if len(newer) > self.per_page:
+                keys = newer[-self.per_page:]
+                if horizon is None or keys[-1] >= horizon:
+                    return self._get_page(self._posts(keys), self,
+                                          has_next=True, has_previous=True)
+                return super().get_page(before=before)
+        keys = list(islice(heapq.merge(*lists, reverse=True),
+                           self.per_page + 1))
+        if self._complete(keys, horizon):
+            return self._posts_page(keys, has_previous=False)
+        return super().get_page()
+
+    def _complete(self, keys, horizon):
+        if horizon is None:
+            return True
+        return len(keys) > self.per_page and keys[-1] >= horizon
+
+    def _posts(self, keys):
+        ids = [pk for _, pk in keys[:self.per_page]]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def _posts_page(self, keys, has_previous):
+        return self._get_page(self._posts(keys), self,
+                              has_next=len(keys) > self.per_page,
+                              has_previous=has_previous)
+
+
+def paginate_follow_feed(request):
+    """Лента подписок из источника, выбранного FOLLOW_FEED_SOURCE."""
+    source = feed_source()
+    if source == "timeline":
+        return paginate(request, timeline_for(request.user),
+                        timeline_scope(request.user.id),
+                        keyset_class=TimelinePaginator,
+                        numbered_class=NumberedTimelinePaginator)
+    post_list = Post.objects.for_feed().filter(
+        author__following__user=request.user)
+    if source == "pull" and "page" not in request.GET:
+        paginator = PullFeedPaginator(
+            post_list, PAGE_SIZE,
+            author_ids=followed_author_ids(request.user.id))
+        page = paginator.get_page(after=request.GET.get("after"),
+                                  before=request.GET.get("before"))
+        return paginator, page
+    return paginate(request, post_list, timeline_scope(request.user.id))
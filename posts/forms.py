@@ -1,6 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
-from .models import Post, Comment
+from . import thumbnails
+from .ingest import ingest_image
+from .models import Post, Comment, Group
 
 
 class PostForm(forms.ModelForm):
@@ -14,6 +17,29 @@ class PostForm(forms.ModelForm):
                  }
         help_texts = {'group': 'Из уже существующих'}
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        # Новая загрузка, а не уже сохранённый файл поста.
+        if isinstance(image, UploadedFile):
+            return ingest_image(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        image_changed = 'image' in self.changed_data
+        if image_changed:
+            post.image_placeholder = ''
+        if commit:
+            if post.pk is None:
+                post.save()
+            else:
+                # Счётчики не перезаписываем устаревшими значениями.
+                post.save(update_fields=[*self._meta.fields, 'modified',
+                                         'image_placeholder'])
+            if image_changed and post.image:
+                thumbnails.generate_later(post)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     text = forms.CharField(widget=forms.Textarea)
@@ -22,3 +48,12 @@ class CommentForm(forms.ModelForm):
         model = Comment
         fields = ('text',)
         labels = {'text': 'Введите текст комментария'}
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=200, required=False)
+    group = forms.ModelChoiceField(queryset=Group.objects.all(),
+                                   to_field_name='slug',
+                                   label='Группа',
+                                   required=False)
+    author = forms.CharField(label='Автор', max_length=150, required=False)
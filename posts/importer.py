@@ -0,0 +1,308 @@
+"""Массовый импорт данных другого экземпляра yatube (import_yatube).
+
+Вход — JSONL или CSV, по записи на строку; тип записи в поле type:
+
+    group    slug, title, description
+    post     id, text, author, group (slug), pub_date, image
+    comment  post (id поста в источнике), author, text, created
+    follow   user, author
+
+Авторы и группы ищутся по username и slug; недостающие пользователи
+создаются без пароля. Комментарии должны идти после своих постов.
+Файлы картинок не копируются: image — имя в хранилище MEDIA_ROOT.
+"""
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching, counters, follow_feed, media, timeline
+from .models import (Comment, Follow, Group, ImportCheckpoint, ImportedPost,
+                     Post, User)
+from .pagination import count_cache_key
+
+BATCH_SIZE = 1000
+# Тип записи -> обязательные поля.
+RECORD_TYPES = {
+    "group": ("slug",),
+    "post": ("id", "text", "author"),
+    "comment": ("post", "author", "text"),
+    "follow": ("user", "author"),
+}
+# Даты из источника; без них — время импорта.
+DATE_FIELDS = {"post": "pub_date", "comment": "created"}
+
+
+def read_records(path, skip=0):
+    """Пары (номер записи, запись); файл читается потоково."""
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.endswith(".csv"):
+            records = ({key: value or None for key, value in row.items()}
+                       for row in csv.DictReader(file))
+            yield from islice(enumerate(records, start=1), skip, None)
+            return
+        lines = (line for line in file if line.strip())
+        # Уже записанные строки пропускаются без разбора.
+        for number, line in islice(enumerate(lines, start=1), skip, None):
+            try:
+                yield number, json.loads(line)
+            except ValueError as error:
+                raise CommandError(f"{path}, запись {number}: "
+                                   f"не JSON ({error})")
+
+
+def reserve_ids(model, count):
+    """Диапазон из count новых id таблицы с AUTOINCREMENT (только SQLite).
+
+    Счётчик sqlite_sequence сдвигается в транзакции пачки: запись в него
+    блокирует БД для других писателей до её конца, а AUTOINCREMENT не
+    выдаёт повторно id удалённых строк, в отличие от MAX(id) + 1.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE sqlite_sequence SET seq = seq + %s "
+                       "WHERE name = %s", [count, table])
+        if not cursor.rowcount:
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) "
+                           "VALUES (%s, %s)", [table, count])
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s",
+                       [table])
+        last = cursor.fetchone()[0]
+    return range(last - count + 1, last + 1)
+
+
+def check_record(path, number, record):
+    """Проверить запись до записи пачки; дата заменяется на datetime."""
+    kind = record.get("type") if isinstance(record, dict) else None
+    if kind not in RECORD_TYPES:
+        raise CommandError(f"{path}, запись {number}: неизвестный тип "
+                           f"записи {kind!r}")
+    for field in RECORD_TYPES[kind]:
+        if record.get(field) is None:
+            raise CommandError(f"{path}, запись {number}: нет поля "
+                               f"{field!r}")
+    if kind in DATE_FIELDS:
+        field = DATE_FIELDS[kind]
+        try:
+            record[field] = parse_date(record.get(field))
+        except ValueError:
+            raise CommandError(f"{path}, запись {number}: неверная дата "
+                               f"{field}={record[field]!r}")
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    # None — строка не похожа на дату, ValueError — дата невозможна.
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(value)
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def assign_ids(model, objs):
+    if objs and not connection.features.can_return_ids_from_bulk_insert:
+        # bulk_create в SQLite не возвращает id — выдаём их сами.
+        for obj, pk in zip(objs, reserve_ids(model, len(objs))):
+            obj.pk = pk
+
+
+def create_with_dates(model, objs, date_field, batch_size):
+    """bulk_create с датами из источника.
+
+    auto_now_add при вставке заменяет дату текущим временем, поэтому
+    даты записываются вторым запросом, а поле модели не меняется.
+    """
+    dates = [getattr(obj, date_field) for obj in objs]
+    assign_ids(model, objs)
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    for obj, date in zip(objs, dates):
+        setattr(obj, date_field, date)
+    model.objects.bulk_update(objs, [date_field], batch_size=batch_size)
+
+
+class Importer:
+    """Пишет записи пачками через bulk_create; пачка — одна транзакция.
+
+    После каждой пачки сохраняется ImportCheckpoint, поэтому повторный
+    запуск после сбоя продолжает с первой незаписанной строки (после
+    ошибки объект не переиспользуется: его словари могли уйти вперёд).
+    Счётчики, ленты и кэши пересчитываются один раз в finish().
+    """
+
+    def __init__(self, source, batch_size=BATCH_SIZE, report=None):
+        self.source = source
+        self.batch_size = batch_size
+        self.report = report or (lambda message: None)
+        self.users = dict(User.objects.values_list("username", "pk"))
+        self.groups = dict(Group.objects.values_list("slug", "pk"))
+        self.posts = dict(ImportedPost.objects.filter(
+            source=source).values_list("source_id", "post_id"))
+        self.written = 0
+        self.skipped = 0
+        self.authors = set()
+        self.followers = set()
+        self.group_ids = set()
+        # Продолжаем после сбоя: часть записей сделал прошлый запуск.
+        self.resumed = False
+
+    def import_file(self, path):
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=self.source, path=os.path.abspath(path))
+        if checkpoint.line:
+            self.resumed = True
+        records = read_records(path, checkpoint.line)
+        started = time.monotonic()
+        done = 0
+        while True:
+            chunk = list(islice(records, self.batch_size))
+            if not chunk:
+                break
+            for number, record in chunk:
+                check_record(path, number, record)
+            with transaction.atomic():
+                self.write([record for _, record in chunk])
+                checkpoint.line = chunk[-1][0]
+                checkpoint.save(update_fields=["line"])
+            done += len(chunk)
+            rate = done / max(time.monotonic() - started, 1e-6)
+            self.report(f"{path}: {checkpoint.line} строк, "
+                        f"{rate:.0f} строк/с")
+        return done
+
+    def write(self, records):
+        by_type = {kind: [] for kind in RECORD_TYPES}
+        for record in records:
+            by_type[record["type"]].append(record)
+        self.write_groups(by_type["group"] + by_type["post"])
+        self.write_users(by_type)
+        self.write_posts(by_type["post"])
+        self.write_comments(by_type["comment"])
+        self.write_follows(by_type["follow"])
+
+    def write_groups(self, records):
+        new = {}
+        for record in records:
+            slug = record.get("slug") if record["type"] == "group" \
+                else record.get("group")
+            if slug and slug not in self.groups and slug not in new:
+                new[slug] = Group(slug=slug,
+                                  title=record.get("title") or slug,
+                                  description=record.get("description")
+                                  or "")
+        if new:
+            Group.objects.bulk_create(new.values())
+            self.groups.update(Group.objects.filter(
+                slug__in=new).values_list("slug", "pk"))
+
+    def write_users(self, by_type):
+        names = {record["author"] for kind in ("post", "comment", "follow")
+                 for record in by_type[kind]}
+        names |= {record["user"] for record in by_type["follow"]}
+        new = names - set(self.users)
+        if new:
+            # Войти такие пользователи смогут после сброса пароля.
+            password = make_password(None)
+            User.objects.bulk_create(
+                User(username=username, password=password)
+                for username in new)
+            self.users.update(User.objects.filter(
+                username__in=new).values_list("username", "pk"))
+
+    def write_posts(self, records):
+        records = [record for record in records
+                   if str(record["id"]) not in self.posts]
+        if not records:
+            return
+        posts = [Post(text=record["text"],
+                      author_id=self.users[record["author"]],
+                      group_id=self.groups.get(record.get("group")),
+                      pub_date=record["pub_date"],
+                      image=record.get("image") or None)
+                 for record in records]
+        create_with_dates(Post, posts, "pub_date", self.batch_size)
+        ImportedPost.objects.bulk_create(
+            [ImportedPost(source=self.source, source_id=str(record["id"]),
+                          post_id=post.id)
+             for record, post in zip(records, posts)],
+            batch_size=self.batch_size)
+        for record, post in zip(records, posts):
+            self.posts[str(record["id"])] = post.id
+            self.authors.add(post.author_id)
+            self.group_ids.add(post.group_id)
+        self.written += len(posts)
+
+    def write_comments(self, records):
+        comments = []
+        for record in records:
+            post_id = self.posts.get(str(record["post"]))
+            if post_id is None:
+                self.skipped += 1
+                continue
+            comments.append(Comment(post_id=post_id,
+                                    author_id=self.users[record["author"]],
+                                    text=record["text"],
+                                    created=record["created"]))
+        create_with_dates(Comment, comments, "created", self.batch_size)
+        self.written += len(comments)
+
+    def write_follows(self, records):
+        follows = []
+        for record in records:
+            user_id = self.users[record["user"]]
+            author_id = self.users[record["author"]]
+            if user_id == author_id:
+                self.skipped += 1
+                continue
+            follows.append(Follow(user_id=user_id, author_id=author_id))
+            self.followers.add(user_id)
+        Follow.objects.bulk_create(follows, batch_size=self.batch_size,
+                                   ignore_conflicts=True)
+        self.written += len(follows)
+
+    def touch_previous_runs(self):
+        """Авторы, группы и подписчики из записей прерванных запусков.
+
+        Подписки не помечены источником, поэтому пересобираются ленты
+        всех подписчиков.
+        """
+        imported = Post.objects.filter(pk__in=ImportedPost.objects.filter(
+            source=self.source).values("post_id")).order_by()
+        for author_id, group_id in imported.values_list(
+                "author_id", "group_id").distinct():
+            self.authors.add(author_id)
+            self.group_ids.add(group_id)
+        self.followers.update(Follow.objects.order_by().values_list(
+            "user_id", flat=True).distinct())
+
+    def finish(self):
+        """Один пересчёт денормализованных данных вместо сигналов на строку."""
+        if self.resumed:
+            self.touch_previous_runs()
+        counters.recount_posts(self.batch_size)
+        counters.recount_authors(self.batch_size)
+        media.recount()
+        if follow_feed.feed_source() == "timeline":
+            readers = set(Follow.objects.filter(
+                author_id__in=self.authors).values_list("user_id", flat=True))
+            timeline.rebuild(readers | self.followers)
+        cache.delete_many(
+            [count_cache_key("all")]
+            + [count_cache_key(f"group:{pk}") for pk in self.group_ids]
+            + [count_cache_key(f"author:{pk}") for pk in self.authors]
+            + [follow_feed.recent_key(pk) for pk in self.authors]
+            + [follow_feed.following_key(pk) for pk in self.followers]
+            + [count_cache_key(timeline.timeline_scope(pk))
+               for pk in self.followers])
+        caching.bump_feed_version()
+        caching.bump_scopes(caching.SITE_SCOPE)
@@ -0,0 +1,129 @@
+"""Приём загруженных картинок с ограниченным расходом памяти.
+
+Размеры проверяются по заголовку, до декодирования пикселей. Большие
+JPEG декодируются сразу в уменьшенном масштабе (draft), остальные
+уменьшаются через reduce. Пиковая память на одну загрузку — не больше
+IMAGE_MAX_PIXELS * 4 байт (для JPEG — примерно (2 * IMAGE_MAX_SIDE)² * 3).
+
+У анимации в IMAGE_MAX_PIXELS должны уложиться все кадры вместе. Кадры
+уменьшаются сразу после декодирования и до кодирования копятся в памяти,
+поэтому пик для анимации — не больше 2 * IMAGE_MAX_PIXELS * 4 байт.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps, ImageSequence
+
+# Форматы, которые сохраняем как есть; прочие перекодируются в PNG.
+KEEP_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+JPEG_QUALITY = 90
+# Форматы, в которых анимация сохраняется анимацией (PNG — это APNG).
+ANIMATED_FORMATS = {"GIF", "WEBP", "PNG"}
+
+
+def limits():
+    return (getattr(settings, "IMAGE_MAX_UPLOAD_SIZE", 10 * 1024 * 1024),
+            getattr(settings, "IMAGE_MAX_PIXELS", 16_000_000),
+            getattr(settings, "IMAGE_MAX_SIDE", 2048))
+
+
+def _check_header(upload, image):
+    max_size, max_pixels, _ = limits()
+    if upload.size is not None and upload.size > max_size:
+        raise ValidationError(
+            f"Файл больше {max_size // (1024 * 1024)} МБ.",
+            code="file_too_large")
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ValidationError(
+            f"Картинка {width}×{height} слишком велика: не больше "
+            f"{max_pixels // 1_000_000} Мпикс.", code="too_many_pixels")
+    # Число кадров тоже из заголовков: пиксели кадров не декодируются.
+    frames = getattr(image, "n_frames", 1)
+    if frames * width * height > max_pixels:
+        raise ValidationError(
+            f"Анимация {width}×{height} из {frames} кадров слишком велика: "
+            f"не больше {max_pixels // 1_000_000} Мпикс. на все кадры.",
+            code="too_many_pixels")
+
+
+def _normalize(image):
+    """Поворот по EXIF и уменьшение; результат уже без метаданных."""
+    _, _, max_side = limits()
+    if image.format == "JPEG":
+        # Декодер JPEG сразу отдаёт картинку в 1/2, 1/4 или 1/8 размера.
+        image.draft(image.mode, (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    if max(image.size) > max_side:
+        # reducing_gap: сначала быстрый reduce в целое число раз.
+        image.thumbnail((max_side, max_side), Image.LANCZOS,
+                        reducing_gap=2.0)
+    return image
+
+
+def _frames(image):
+    """Кадры анимации (RGBA, повёрнутые и уменьшенные) и их длительности."""
+    _, _, max_side = limits()
+    frames = []
+    durations = []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get("duration", 100))
+        frame = ImageOps.exif_transpose(frame).convert("RGBA")
+        if max(frame.size) > max_side:
+            frame.thumbnail((max_side, max_side), Image.LANCZOS,
+                            reducing_gap=2.0)
+        frames.append(frame)
+    return frames, durations
+
+
+def _encode_animation(image, format_):
+    frames, durations = _frames(image)
+    params = {"disposal": 2} if format_ == "GIF" else {}
+    buffer = BytesIO()
+    # Как и в _encode, без exif/icc_profile метаданные не пишутся.
+    frames[0].save(buffer, format_, save_all=True,
+                   append_images=frames[1:], duration=durations,
+                   loop=image.info.get("loop", 0), **params)
+    return buffer.getvalue()
+
+
+def _encode(image, format_):
+    buffer = BytesIO()
+    if format_ == "JPEG":
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(buffer, format_, quality=JPEG_QUALITY, optimize=True)
+    else:
+        # Без exif/pnginfo/icc_profile Pillow метаданные не пишет.
+        image.save(buffer, format_)
+    return buffer.getvalue()
+
+
+def ingest_image(upload):
+    """Проверить загрузку и вернуть очищенный файл для сохранения."""
+    upload.seek(0)
+    with Image.open(upload) as image:
+        _check_header(upload, image)
+        if getattr(image, "is_animated", False) \
+                and image.format in ANIMATED_FORMATS:
+            # Анимация остаётся анимацией того же формата.
+            format_ = image.format
+            data = _encode_animation(image, format_)
+        else:
+            format_ = image.format if image.format in KEEP_FORMATS \
+                else "PNG"
+            image = _normalize(image)
+            if image.mode in ("LA", "PA") or "transparency" in image.info:
+                # Прозрачность — в явный альфа-канал: из картинок с
+                # прозрачным цветом sorl-thumbnail не может сделать
+                # JPEG-превью.
+                image = image.convert("RGBA")
+                if format_ == "GIF":
+                    format_ = "PNG"
+            data = _encode(image, format_)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return SimpleUploadedFile(name + KEEP_FORMATS[format_], data,
+                              content_type=Image.MIME[format_])
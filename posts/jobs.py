@@ -0,0 +1,163 @@
+"""Очередь фоновых задач в БД без внешнего брокера.
+
+Обработчики запросов только ставят задачи (enqueue) в той же транзакции,
+что и основную запись. Разбирает очередь manage.py run_workers.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 5
+BACKOFF_MAX = 3600
+# Задача, взятая упавшим воркером, через это время снова в очереди.
+LOCK_TIMEOUT = timedelta(minutes=10)
+CLAIM_BATCH = 20
+POLL_INTERVAL = 1.0
+# Как часто воркер удаляет старые выполненные задачи, секунд.
+PURGE_INTERVAL = 60
+
+TASKS = {}
+
+
+def task(func=None, *, max_attempts=MAX_ATTEMPTS):
+    """Регистрирует функцию как задачу; аргументы — только JSON-значения."""
+    def register(func):
+        func.task_name = f"{func.__module__}.{func.__name__}"
+        func.max_attempts = max_attempts
+        TASKS[func.task_name] = func
+        return func
+    return register(func) if func is not None else register
+
+
+def eager():
+    # In-memory база SQLite живёт в одном процессе: воркерам её не увидеть.
+    return getattr(settings, "JOBS_EAGER", False) or (
+        connection.vendor == "sqlite" and connection.is_in_memory_db())
+
+
+def enqueue(func, key=None, delay=0, **payload):
+    """Поставить задачу; в режиме JOBS_EAGER она выполняется сразу."""
+    if eager():
+        _call(func, payload)
+        return None
+    job = Job(name=func.task_name,
+              payload=json.dumps(payload),
+              key=key,
+              max_attempts=func.max_attempts,
+              run_at=timezone.now() + timedelta(seconds=delay))
+    if key is None:
+        job.save(force_insert=True)
+        return job
+    try:
+        with transaction.atomic():
+            job.save(force_insert=True)
+    except IntegrityError:
+        # Задача с этим ключом уже стоит или выполнена.
+        return None
+    return job
+
+
+def _call(func, payload):
+    try:
+        with transaction.atomic():
+            func(**payload)
+    except Exception:
+        logger.exception("Job %s failed", func.task_name)
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _runnable(now):
+    return (Q(status=Job.PENDING, run_at__lte=now)
+            | Q(status=Job.RUNNING, locked_at__lt=now - LOCK_TIMEOUT))
+
+
+def claim(worker):
+    """Взять одну готовую задачу; None, если брать нечего."""
+    now = timezone.now()
+    candidates = list(Job.objects.filter(_runnable(now)).order_by(
+        "run_at", "pk").values_list("pk", flat=True)[:CLAIM_BATCH])
+    for pk in candidates:
+        # Условный UPDATE: задачу получает только один воркер.
+        claimed = Job.objects.filter(_runnable(now), pk=pk).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now,
+            attempts=F("attempts") + 1)
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def execute(job):
+    """Выполнить задачу; при ошибке — повтор с экспоненциальной паузой."""
+    func = TASKS.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task {job.name}")
+        with transaction.atomic():
+            func(**json.loads(job.payload))
+            # Результат и отметка о выполнении фиксируются вместе.
+            if job.key is None:
+                job.delete()
+            else:
+                Job.objects.filter(pk=job.pk).update(
+                    status=Job.DONE, locked_at=None, last_error="")
+        return True
+    except Exception as error:
+        logger.exception("Job %s failed", job)
+        failed = job.attempts >= job.max_attempts
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED if failed else Job.PENDING,
+            run_at=timezone.now() + backoff(job.attempts),
+            locked_at=None,
+            last_error=f"{type(error).__name__}: {error}")
+        return False
+
+
+def purge():
+    """Удалить выполненные задачи старше срока хранения; вернуть их число."""
+    days = getattr(settings, "JOBS_DONE_RETENTION_DAYS", 7)
+    # run_at выполненной задачи — почти время выполнения; индекс
+    # (status, run_at) годится и здесь.
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE,
+        run_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
+
+
+def work(once=False, poll_interval=POLL_INTERVAL):
+    """Цикл воркера; с once=True выходит, когда очередь пуста."""
+    worker = worker_id()
+    done = 0
+    purged = None
+    while True:
+        if purged is None or time.monotonic() - purged >= PURGE_INTERVAL:
+            purge()
+            purged = time.monotonic()
+        job = claim(worker)
+        if job is None:
+            if once:
+                return done
+            time.sleep(poll_interval)
+            continue
+        done += execute(job)
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import BATCH_SIZE, FORMATS, export_stream
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = "Потоково выгружает посты, комментарии и подписки (JSONL/CSV)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user",
+                            help="выгрузить только данные этого username")
+        parser.add_argument("--format", choices=sorted(FORMATS),
+                            default="jsonl")
+        parser.add_argument("--gzip", action="store_true",
+                            help="сжимать gzip на лету")
+        parser.add_argument("--output", default="-",
+                            help="файл; по умолчанию stdout")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                            help="сколько строк читать из БД за запрос")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            user = User.objects.filter(username=options["user"]).first()
+            if user is None:
+                raise CommandError(f"Нет пользователя {options['user']}")
+        chunks = export_stream(user, options["format"], options["gzip"],
+                               options["batch_size"])
+        if options["output"] == "-":
+            output = getattr(self.stdout, "buffer", sys.stdout.buffer)
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
+            return
+        with open(options["output"], "wb") as output:
+            for chunk in chunks:
+                output.write(chunk)
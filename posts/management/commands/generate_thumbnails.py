@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import caching, thumbnails
+from posts.models import Post
+
+
+def generate_batch(post_ids):
+    """Задача процесса-воркера: превью для пачки постов."""
+    done = 0
+    for post in Post.objects.filter(pk__in=post_ids).only("image"):
+        thumbnails.save_generated(post.pk, thumbnails.generate(post.image))
+        done += 1
+    return done
+
+
+class Command(BaseCommand):
+    help = "Генерирует недостающие превью картинок постов параллельно."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4,
+                            help="сколько процессов запустить")
+        parser.add_argument("--batch-size", type=int, default=50,
+                            help="сколько постов отдавать процессу за раз")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        post_ids = list(Post.objects.exclude(image="").order_by("pk")
+                        .values_list("pk", flat=True))
+        batches = [post_ids[i:i + batch_size]
+                   for i in range(0, len(post_ids), batch_size)]
+        if options["workers"] <= 1:
+            done = sum(map(generate_batch, batches))
+        else:
+            # Соединения не должны достаться дочерним процессам.
+            connections.close_all()
+            with ProcessPoolExecutor(options["workers"]) as executor:
+                done = sum(executor.map(generate_batch, batches))
+        caching.bump_feed_version()
+        caching.bump_scopes(caching.SITE_SCOPE)
+        self.stdout.write(f"Обработано постов: {done}")
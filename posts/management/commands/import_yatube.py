@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.importer import BATCH_SIZE, Importer
+
+
+class Command(BaseCommand):
+    help = ("Импортирует группы, посты, комментарии и подписки из JSONL/CSV "
+            "другого экземпляра; прерванный импорт продолжается с места сбоя.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+",
+                            help="файлы .jsonl или .csv, по порядку")
+        parser.add_argument("--source", default="default",
+                            help="имя источника: по нему ищется прогресс "
+                                 "и соответствие id постов")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                            help="сколько строк писать за транзакцию")
+
+    def handle(self, *args, **options):
+        importer = Importer(options["source"], options["batch_size"],
+                            report=self.stdout.write)
+        for path in options["paths"]:
+            importer.import_file(path)
+        self.stdout.write("Пересчёт счётчиков и лент...")
+        importer.finish()
+        self.stdout.write(f"Записано: {importer.written}, "
+                          f"пропущено: {importer.skipped}")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = "Пересобирает ленты подписок (TimelineEntry) с нуля."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append",
+                            dest="users",
+                            help="id пользователя; можно указать несколько")
+        parser.add_argument("--limit", type=int,
+                            default=timeline.BACKFILL_SIZE,
+                            help="сколько постов каждого автора добавить")
+
+    def handle(self, *args, **options):
+        count = timeline.rebuild(options["users"], options["limit"])
+        self.stdout.write(f"Пересобрано подписок: {count}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import caching, counters, media
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счётчики комментариев и профилей пачками."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int,
+                            default=counters.BATCH_SIZE,
+                            help="сколько строк обрабатывать за транзакцию")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        posts = counters.recount_posts(batch_size)
+        authors = counters.recount_authors(batch_size)
+        files = media.recount()
+        caching.bump_scopes(caching.SITE_SCOPE)
+        self.stdout.write(f"Исправлено постов: {posts}, профилей: {authors}, "
+                          f"файлов: {files}")
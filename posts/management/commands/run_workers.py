@@ -0,0 +1,33 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import jobs
+
+
+class Command(BaseCommand):
+    help = "Запускает воркеры очереди фоновых задач."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2,
+                            help="сколько процессов-воркеров запустить")
+        parser.add_argument("--once", action="store_true",
+                            help="выйти, когда очередь опустеет")
+        parser.add_argument("--poll-interval", type=float,
+                            default=jobs.POLL_INTERVAL,
+                            help="пауза между опросами пустой очереди, с")
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        work_options = (options["once"], options["poll_interval"])
+        if processes <= 1:
+            done = jobs.work(*work_options)
+        else:
+            # Соединения не должны достаться дочерним процессам.
+            connections.close_all()
+            with ProcessPoolExecutor(processes) as executor:
+                futures = [executor.submit(jobs.work, *work_options)
+                           for _ in range(processes)]
+                done = sum(future.result() for future in futures)
+        self.stdout.write(f"Выполнено задач: {done}")
@@ -0,0 +1,115 @@
+import logging
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from .jobs import enqueue, task
+from .models import MediaFile, Post
+
+logger = logging.getLogger(__name__)
+
+
+def stored_name(post):
+    """Имя картинки, загруженное из БД, без обращения к отложенному полю."""
+    value = post.__dict__.get("image")
+    return getattr(value, "name", value) or ""
+
+
+def claim(name):
+    """Бронь файла от загрузки до сохранения поста (снимает acquire).
+
+    Вызывается в транзакции вместе с проверкой, что файл есть на диске:
+    collect удаляет строку и файл в своей транзакции, поэтому либо бронь
+    его остановит, либо загрузка увидит, что файла нет, и запишет его.
+    """
+    if MediaFile.objects.filter(name=name).update(
+            pending=F("pending") + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaFile.objects.create(name=name, pending=1)
+    except IntegrityError:
+        MediaFile.objects.filter(name=name).update(pending=F("pending") + 1)
+
+
+def unclaimed():
+    return Greatest(F("pending") - 1, 0)
+
+
+def acquire(name, claimed=False):
+    """Добавить ссылку; claimed — имя получено из claim этой загрузки."""
+    if not name:
+        return
+    changes = {"refs": F("refs") + 1}
+    if claimed:
+        changes["pending"] = unclaimed()
+    if MediaFile.objects.filter(name=name).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            MediaFile.objects.create(name=name, refs=1)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос.
+        MediaFile.objects.filter(name=name).update(refs=F("refs") + 1)
+
+
+def release(name):
+    """Снять ссылку; файл удалит задача, если ссылок не осталось."""
+    if not name:
+        return
+    MediaFile.objects.filter(name=name, refs__gt=0).update(
+        refs=F("refs") - 1)
+    enqueue(collect, name=name)
+
+
+@task
+def collect(name):
+    # Файл удаляется в той же транзакции, что и строка: claim параллельной
+    # загрузки ждёт её конца и после не найдёт ни строки, ни файла.
+    with transaction.atomic():
+        deleted, _ = MediaFile.objects.filter(name=name, refs=0,
+                                              pending=0).delete()
+        if deleted:
+            storage = Post._meta.get_field("image").storage
+            # Вместе с файлом — записи sorl-thumbnail и все превью.
+            try:
+                delete_with_thumbnails(ImageFile(name, storage))
+            except (OSError, SuspiciousFileOperation):
+                # Ошибка уборки не должна ронять запрос, удаливший пост.
+                logger.exception("Could not delete media file %s", name)
+
+
+def replace(old_name, new_name, claimed=False):
+    if old_name != new_name:
+        acquire(new_name, claimed)
+        release(old_name)
+    elif claimed:
+        # Загрузили тот же файл заново: ссылка уже есть, снимаем бронь.
+        MediaFile.objects.filter(name=new_name).update(pending=unclaimed())
+
+
+def recount():
+    """Пересчитать ссылки по постам; возвращает число исправленных файлов."""
+    counts = dict(Post.objects.exclude(image="").exclude(image=None)
+                  .order_by().values("image").annotate(refs=Count("pk"))
+                  .values_list("image", "refs"))
+    fixed = 0
+    stored = dict(MediaFile.objects.values_list("name", "refs"))
+    for name, refs in counts.items():
+        if stored.get(name) != refs:
+            MediaFile.objects.update_or_create(name=name,
+                                               defaults={"refs": refs})
+            fixed += 1
+    orphans = set(stored) - set(counts)
+    for name in orphans:
+        if stored[name]:
+            fixed += 1
+    # Брони загрузок, так и не сохранивших пост, тоже снимаются.
+    MediaFile.objects.filter(name__in=orphans).update(refs=0, pending=0)
+    for name in orphans:
+        enqueue(collect, name=name)
+    return fixed
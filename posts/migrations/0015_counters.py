@@ -0,0 +1,69 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_comment_count(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    comments = Comment.objects.filter(
+        post=models.OuterRef('pk')).order_by().values('post').annotate(
+            count=models.Count('pk')).values('count')
+    Post.objects.filter(pk__in=Comment.objects.values('post')).update(
+        comment_count=models.Subquery(comments))
+
+
+def fill_author_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+
+    def counts(model, field):
+        return dict(model.objects.order_by().values(field).annotate(
+            count=models.Count('pk')).values_list(field, 'count'))
+
+    posts = counts(Post, 'author_id')
+    followers = counts(Follow, 'author_id')
+    following = counts(Follow, 'user_id')
+    AuthorStats.objects.bulk_create([
+        AuthorStats(user_id=user_id,
+                    posts_count=posts.get(user_id, 0),
+                    followers_count=followers.get(user_id, 0),
+                    following_count=following.get(user_id, 0))
+        for user_id in User.objects.values_list('pk', flat=True)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_post_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='stats',
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_comment_count, migrations.RunPython.noop),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:30
+
+from django.db import migrations
+
+FORWARD_SQL = [
+    """CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+           text, content='posts_post', content_rowid='id',
+           tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+           INSERT INTO posts_post_fts(rowid, text)
+           VALUES (new.id, new.text);
+       END""",
+    """CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+           INSERT INTO posts_post_fts(posts_post_fts, rowid, text)
+           VALUES ('delete', old.id, old.text);
+       END""",
+    """CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text ON posts_post
+       BEGIN
+           INSERT INTO posts_post_fts(posts_post_fts, rowid, text)
+           VALUES ('delete', old.id, old.text);
+           INSERT INTO posts_post_fts(rowid, text)
+           VALUES (new.id, new.text);
+       END""",
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+]
+
+BACKWARD_SQL = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_update",
+    "DROP TRIGGER IF EXISTS posts_post_fts_delete",
+    "DROP TRIGGER IF EXISTS posts_post_fts_insert",
+    "DROP TABLE IF EXISTS posts_post_fts",
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        # Полнотекстовый индекс FTS5 есть только в SQLite.
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(FORWARD_SQL),
+                             run_sqlite(BACKWARD_SQL)),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:31
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+post_fts = import_module('posts.migrations.0016_post_fts')
+
+# SQLite пересоздаёт таблицу при изменении схемы, и триггеры FTS
+# пропадают вместе со старой таблицей. Ставим их заново.
+TRIGGERS_SQL = [
+    statement.replace('CREATE TRIGGER', 'CREATE TRIGGER IF NOT EXISTS')
+    for statement in post_fts.FORWARD_SQL
+    if statement.lstrip().startswith('CREATE TRIGGER')
+]
+restore_triggers = post_fts.run_sqlite(TRIGGERS_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:33
+
+from importlib import import_module
+
+from django.db import migrations, models
+import posts.storage
+
+restore_triggers = import_module(
+    'posts.migrations.0017_post_image_placeholder').restore_triggers
+
+
+def fill_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    refs = (Post.objects.exclude(image='').exclude(image=None).order_by()
+            .values('image').annotate(refs=models.Count('pk'))
+            .values_list('image', 'refs'))
+    MediaFile.objects.bulk_create(
+        [MediaFile(name=name, refs=count) for name, count in refs],
+        batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('name', models.CharField(max_length=100,
+                                          primary_key=True,
+                                          serialize=False)),
+                ('refs', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=posts.storage.ContentAddressedStorage(),
+                upload_to='posts/'),
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+        migrations.RunPython(fill_refs, migrations.RunPython.noop),
+    ]
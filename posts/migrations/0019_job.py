@@ -0,0 +1,47 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_mediafile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True,
+                                        primary_key=True,
+                                        serialize=False,
+                                        verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('payload', models.TextField(default='{}')),
+                ('key', models.CharField(blank=True,
+                                         max_length=200,
+                                         null=True,
+                                         unique=True)),
+                ('status', models.CharField(
+                    choices=[('pending', 'В очереди'),
+                             ('running', 'Выполняется'),
+                             ('done', 'Выполнена'),
+                             ('failed', 'Ошибка')],
+                    default='pending',
+                    max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('run_at', models.DateTimeField()),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'run_at'],
+                               name='job_status_run_at_idx'),
+        ),
+    ]
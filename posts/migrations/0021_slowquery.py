@@ -0,0 +1,35 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_import_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.AutoField(auto_created=True,
+                                        primary_key=True,
+                                        serialize=False,
+                                        verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=32,
+                                                 unique=True)),
+                ('sql', models.TextField()),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('total_time', models.FloatField(default=0)),
+                ('max_time', models.FloatField(default=0)),
+                ('last_params', models.TextField(blank=True)),
+                ('last_view', models.CharField(blank=True, max_length=200)),
+                ('plan', models.TextField(blank=True)),
+                ('last_seen', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-total_time'],
+            },
+        ),
+    ]
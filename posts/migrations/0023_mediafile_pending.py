@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='pending',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -13,6 +16,21 @@ class Group(models.Model):
         return self.title
 
 
+def comments_count(post_ref="pk"):
+    """Число комментариев поста подзапросом (для пересчёта счётчиков)."""
+    comments = Comment.objects.filter(
+        post=models.OuterRef(post_ref)).order_by().values("post").annotate(
+            count=models.Count("pk")).values("count")
+    return Coalesce(models.Subquery(comments), 0)
+
+
+class PostQuerySet(models.QuerySet):
+
+    def for_feed(self):
+        """Всё, что нужно карточке поста, одним запросом."""
+        return self.select_related("author", "group")
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField("date published",
@@ -26,10 +44,27 @@ class Post(models.Model):
                               related_name="posts",
                               blank=True,
                               null=True)
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(upload_to='posts/',
+                              storage=ContentAddressedStorage(),
+                              blank=True,
+                              null=True)
+    # data URI размытой копии картинки; заполняется вместе с превью.
+    image_placeholder = models.TextField(blank=True, editable=False)
+    # Обновляется и при изменении комментариев: версия кэша карточки.
+    modified = models.DateTimeField(auto_now=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ["-pub_date"]
+        # Ленты группы и автора идут по ключу (pub_date, id) без сортировки.
+        indexes = [
+            models.Index(fields=["author", "-pub_date", "-id"],
+                         name="post_author_date_idx"),
+            models.Index(fields=["group", "-pub_date", "-id"],
+                         name="post_group_date_idx"),
+        ]
 
 
 class Comment(models.Model):
@@ -44,6 +79,12 @@ class Comment(models.Model):
                                on_delete=models.CASCADE,
                                related_name="comments")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["post", "created"],
+                         name="comment_post_created_idx"),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User,
@@ -60,3 +101,134 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=["user", "author"],
                                     name="unique_object")
         ]
+        indexes = [
+            models.Index(fields=["author", "user"],
+                         name="follow_author_user_idx"),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок пользователя (заполняется при записи)."""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name="timeline")
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name="timeline_entries")
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name="+")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"],
+                                    name="unique_timeline_entry")
+        ]
+        indexes = [
+            models.Index(fields=["user", "-pub_date", "-post"],
+                         name="timeline_user_date_idx"),
+            models.Index(fields=["user", "author"],
+                         name="timeline_user_author_idx"),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики профиля, поддерживаемые при записи."""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name="stats")
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class MediaFile(models.Model):
+    """Сколько постов ссылается на файл в хранилище картинок."""
+    name = models.CharField(max_length=100, primary_key=True)
+    refs = models.PositiveIntegerField(default=0)
+    # Загрузки, которые уже нашли файл в хранилище, но ещё не сохранили
+    # пост: пока они есть, уборка файл не трогает.
+    pending = models.PositiveIntegerField(default=0)
+
+
+class Job(models.Model):
+    """Фоновая задача: очередь в БД, её разбирает manage.py run_workers."""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = [(PENDING, "В очереди"), (RUNNING, "Выполняется"),
+                (DONE, "Выполнена"), (FAILED, "Ошибка")]
+
+    name = models.CharField(max_length=200)
+    payload = models.TextField(default="{}")
+    # Ключ идемпотентности: задача с тем же ключом ставится один раз.
+    key = models.CharField(max_length=200, unique=True, blank=True,
+                           null=True)
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_at"],
+                         name="job_status_run_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class ImportedPost(models.Model):
+    """id поста в исходном экземпляре -> наш пост (для import_yatube)."""
+    source = models.CharField(max_length=100)
+    source_id = models.CharField(max_length=50)
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name="+")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "source_id"],
+                                    name="unique_imported_post")
+        ]
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько строк файла импорта уже записано — с них продолжаем."""
+    source = models.CharField(max_length=100)
+    path = models.CharField(max_length=255)
+    line = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "path"],
+                                    name="unique_import_checkpoint")
+        ]
+
+
+class SlowQuery(models.Model):
+    """Медленный запрос, сгруппированный по нормализованному SQL."""
+    fingerprint = models.CharField(max_length=32, unique=True)
+    sql = models.TextField()
+    calls = models.PositiveIntegerField(default=0)
+    total_time = models.FloatField(default=0)
+    max_time = models.FloatField(default=0)
+    last_params = models.TextField(blank=True)
+    last_view = models.CharField(max_length=200, blank=True)
+    plan = models.TextField(blank=True)
+    last_seen = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-total_time"]
+
+    def __str__(self):
+        return self.sql[:100]
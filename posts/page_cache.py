@@ -0,0 +1,76 @@
+"""Кэш целых страниц для анонимных читателей.
+
+Представление помечает страницу тегами — областями версий из caching
+(post:<id>, group:<id>, list:all, ...). Вместе с ответом хранятся версии
+тегов; если хоть одна сдвинулась, страница считается удалённой, так что
+запись сбрасывает ровно те страницы, где видны изменённые объекты.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+from .caching import SITE_SCOPE, scope_versions, stale_reads
+
+# Актуальность обеспечивают теги, срок — только чтобы не копить мусор.
+PAGE_TIMEOUT = 60 * 10
+
+
+def tag_page(request, *tags):
+    """Добавить теги к странице, которую строит представление."""
+    if not hasattr(request, "page_tags"):
+        request.page_tags = set()
+    request.page_tags.update(tags)
+
+
+def post_tags(posts):
+    return [f"post:{post.pk}" for post in posts]
+
+
+def page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"page:{path}"
+
+
+def is_anonymous(request):
+    # Сессию не загружаем: у вошедших всегда есть её кука.
+    return (request.method in ("GET", "HEAD")
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES)
+
+
+def anonymous_cache(view):
+    """Отдаёт анонимам сохранённый ответ, пока не сдвинулись его теги."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = cached_view(request, *args, **kwargs)
+        # Вошедшим и анонимам downstream-кэши должны отдавать разное.
+        patch_vary_headers(response, ("Cookie",))
+        return response
+
+    def cached_view(request, *args, **kwargs):
+        if not is_anonymous(request):
+            return view(request, *args, **kwargs)
+        key = page_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            tags, versions, response = cached
+            if scope_versions(tags) == versions:
+                return response
+        started = time.time_ns() // 1000
+        stale = stale_reads()
+        response = view(request, *args, **kwargs)
+        tags = getattr(request, "page_tags", None)
+        if (not tags or response.status_code != 200 or response.streaming
+                or response.cookies or stale_reads() != stale):
+            return response
+        tags = sorted({SITE_SCOPE, *tags})
+        versions = scope_versions(tags)
+        # Версия новее начала запроса — данные могли поменяться, пока
+        # страница строилась.
+        if max(versions) < started:
+            cache.set(key, (tags, versions, response), PAGE_TIMEOUT)
+        return response
+    return wrapper
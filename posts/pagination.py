@@ -0,0 +1,237 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .caching import fetch
+from .models import AuthorStats
+
+PAGE_SIZE = 10
+COUNT_TIMEOUT = 60 * 5
+# Начиная с такой оценки точный COUNT(*) не выполняется.
+ESTIMATE_THRESHOLD = 100000
+
+
+def encode_key(pub_date, pk):
+    raw = f"{pub_date.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def encode_cursor(post):
+    return encode_key(post.pub_date, post.pk)
+
+
+def decode_cursor(token):
+    """Возвращает пару (pub_date, id) или None для битого токена."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        pub_date, pk = raw.decode().rsplit("|", 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class KeysetPage(Page):
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f"<Keyset page of {len(self.object_list)} items>"
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.cursor_for(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.cursor_for(self.object_list[0])
+        return None
+
+
+class KeysetPaginator(Paginator):
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Страница задаётся непрозрачным курсором ``after``/``before`` —
+    граничной записью соседней страницы.
+    """
+    ordering = ("-pub_date", "-id")
+
+    def __init__(self, object_list, per_page):
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+        self.date_field, self.id_field = (
+            field.lstrip("-") for field in self.ordering
+        )
+
+    def get_page(self, after=None, before=None):
+        after = decode_cursor(after)
+        if after is not None:
+            return self._page_after(*after)
+        before = decode_cursor(before)
+        if before is not None:
+            return self._page_before(*before)
+        return self._first_page()
+
+    def _get_page(self, *args, **kwargs):
+        return KeysetPage(*args, **kwargs)
+
+    def cursor_for(self, post):
+        return encode_cursor(post)
+
+    def _first_page(self):
+        rows = list(self.object_list[:self.per_page + 1])
+        return self._get_page(rows[:self.per_page], self,
+                              has_next=len(rows) > self.per_page,
+                              has_previous=False)
+
+    def _page_after(self, pub_date, pk):
+        rows = list(self.object_list.filter(
+            Q(**{f"{self.date_field}__lt": pub_date})
+            | Q(**{self.date_field: pub_date, f"{self.id_field}__lt": pk})
+        )[:self.per_page + 1])
+        return self._get_page(rows[:self.per_page], self,
+                              has_next=len(rows) > self.per_page,
+                              has_previous=True)
+
+    def _page_before(self, pub_date, pk):
+        rows = list(self.object_list.filter(
+            Q(**{f"{self.date_field}__gt": pub_date})
+            | Q(**{self.date_field: pub_date, f"{self.id_field}__gt": pk})
+        ).reverse()[:self.per_page + 1])
+        if len(rows) <= self.per_page:
+            # Дошли до начала ленты — отдаём полноценную первую страницу.
+            return self._first_page()
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return self._get_page(rows, self, has_next=True, has_previous=True)
+
+
+def page_query(request):
+    """Параметры запроса без параметров страницы — для ссылок паджинатора."""
+    query = request.GET.copy()
+    for name in ("page", "after", "before"):
+        query.pop(name, None)
+    return query.urlencode()
+
+
+def count_cache_key(scope):
+    return f"count:{scope}"
+
+
+def stat_estimate(table):
+    """Оценка размера таблицы по sqlite_stat1, которую заполняет ANALYZE."""
+    if connection.vendor != "sqlite":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master "
+                       "WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute("SELECT idx, stat FROM sqlite_stat1 WHERE tbl = %s",
+                       [table])
+        stats = dict(cursor.fetchall())
+        if not stats:
+            return None
+    return int(next(iter(stats.values())).split()[0])
+
+
+class NumberedPage(Page):
+
+    def page_window(self, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг текущей; None обозначает пропуск."""
+        num_pages = self.paginator.num_pages
+        window = set(range(1, min(on_ends, num_pages) + 1))
+        window.update(range(max(num_pages - on_ends + 1, 1), num_pages + 1))
+        window.update(range(max(self.number - on_each_side, 1),
+                            min(self.number + on_each_side, num_pages) + 1))
+        pages = []
+        for number in sorted(window):
+            if pages and number - pages[-1] > 1:
+                pages.append(None)
+            pages.append(number)
+        return pages
+
+
+class CachedCountPaginator(Paginator):
+    """Нумерованный паджинатор с кэшированным числом записей.
+
+    scope — имя выборки ("all", "group:<id>", "author:<id>", ...), под
+    которым кэшируется счётчик; сигналы сбрасывают его при изменениях.
+    Для очень больших выборок вместо COUNT(*) берётся оценка.
+    """
+
+    def __init__(self, object_list, per_page, scope, timeout=COUNT_TIMEOUT):
+        super().__init__(object_list, per_page)
+        self.scope = scope
+        self.timeout = timeout
+
+    def _get_page(self, *args, **kwargs):
+        return NumberedPage(*args, **kwargs)
+
+    @cached_property
+    def count(self):
+        return fetch(count_cache_key(self.scope), self._count, self.timeout)
+
+    def _count(self):
+        count = self.estimate()
+        if count is None:
+            count = super().count
+        return count
+
+    def estimate(self):
+        kind, _, value = self.scope.partition(":")
+        if kind == "author":
+            # Поддерживаемый счётчик точен — COUNT(*) не нужен вовсе.
+            return AuthorStats.objects.filter(user_id=value).values_list(
+                "posts_count", flat=True).first()
+        if kind != "all":
+            # Для групп sqlite_stat1 знает лишь среднее по всем группам, а
+            # размеры групп сильно разные: точный COUNT(*) по индексу
+            # post_group_date_idx, закэшированный на COUNT_TIMEOUT.
+            return None
+        estimate = stat_estimate("posts_post")
+        if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+            return estimate
+        return None
+
+
+def paginate(request, object_list, count_scope, per_page=PAGE_SIZE,
+             keyset_class=KeysetPaginator,
+             numbered_class=CachedCountPaginator):
+    """Разбивает ленту постов на страницы по параметрам запроса.
+
+    Старые ссылки вида ``?page=N`` обслуживаются нумерованным
+    паджинатором, все остальные запросы — курсорным.
+    """
+    page_number = request.GET.get("page")
+    if page_number is not None:
+        paginator = numbered_class(
+            object_list.order_by(*keyset_class.ordering), per_page,
+            scope=count_scope)
+        return paginator, paginator.get_page(page_number)
+    paginator = keyset_class(object_list, per_page)
+    page = paginator.get_page(after=request.GET.get("after"),
+                              before=request.GET.get("before"))
+    return paginator, page
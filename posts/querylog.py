@@ -0,0 +1,147 @@
+"""Журнал медленных SQL-запросов (включается SLOW_QUERY_LOG).
+
+Обёртка connection.execute_wrapper замеряет каждый запрос; те, что
+дольше SLOW_QUERY_THRESHOLD секунд, пишутся в лог вместе с параметрами,
+представлением и EXPLAIN QUERY PLAN, а в таблице SlowQuery копится
+до SLOW_QUERY_KEEP недавних запросов. Админка показывает SLOW_QUERY_TOP
+самых дорогих из них по суммарному времени.
+"""
+import hashlib
+import logging
+import re
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+_recording = ContextVar("recording_slow_query", default=False)
+
+_literal = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_in_list = re.compile(r"IN \(\?(?:, \?)*\)")
+_space = re.compile(r"\s+")
+
+
+def enabled():
+    return getattr(settings, "SLOW_QUERY_LOG", False)
+
+
+def threshold():
+    return getattr(settings, "SLOW_QUERY_THRESHOLD", 0.1)
+
+
+def top_size():
+    return getattr(settings, "SLOW_QUERY_TOP", 50)
+
+
+def keep_size():
+    return getattr(settings, "SLOW_QUERY_KEEP", 1000)
+
+
+def top_queries():
+    """SLOW_QUERY_TOP самых дорогих запросов."""
+    top = SlowQuery.objects.order_by("-total_time").values_list(
+        "pk", flat=True)[:top_size()]
+    return SlowQuery.objects.filter(pk__in=list(top))
+
+
+def normalize(sql):
+    """SQL без значений: запросы, различающиеся только ими, совпадают."""
+    sql = _literal.sub("?", sql)
+    sql = _in_list.sub("IN (...)", sql)
+    return _space.sub(" ", sql).strip()
+
+
+def explain(db, sql, params):
+    if db.vendor != "sqlite" or not sql.lstrip().upper().startswith("SELECT"):
+        return ""
+    with db.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return "\n".join(row[-1] for row in cursor.fetchall())
+
+
+def store(sql, params, view, plan, duration):
+    """Добавить вызов в таблицу и оставить в ней keep_size() записей.
+
+    Вытесняются давно не встречавшиеся запросы, а не дешёвые: иначе частый
+    умеренно медленный запрос не успел бы накопить суммарное время.
+    """
+    fingerprint = hashlib.md5(sql.encode()).hexdigest()
+    fields = {"last_params": repr(params), "last_view": view or "",
+              "plan": plan, "last_seen": timezone.now()}
+    with transaction.atomic():
+        updated = SlowQuery.objects.filter(fingerprint=fingerprint).update(
+            calls=F("calls") + 1,
+            total_time=F("total_time") + duration,
+            max_time=Greatest(F("max_time"), duration),
+            **fields)
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                SlowQuery.objects.create(fingerprint=fingerprint, sql=sql,
+                                         calls=1, total_time=duration,
+                                         max_time=duration, **fields)
+        except IntegrityError:
+            return store(sql, params, view, plan, duration)
+        extra = list(SlowQuery.objects.order_by(
+            "-last_seen", "-pk").values_list("pk", flat=True)[keep_size():])
+        SlowQuery.objects.filter(pk__in=extra).delete()
+
+
+class SlowQueryLogger:
+    """execute_wrapper; view — имя представления или функция без аргументов."""
+
+    def __init__(self, view=None):
+        self.view = view
+
+    def __call__(self, execute, sql, params, many, context):
+        if _recording.get():
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+        if duration >= threshold():
+            self.record(context["connection"], sql, params, many, duration)
+        return result
+
+    def record(self, db, sql, params, many, duration):
+        # Собственные запросы журнала не замеряются.
+        token = _recording.set(True)
+        try:
+            view = self.view() if callable(self.view) else self.view
+            plan = "" if many else explain(db, sql, params)
+            logger.warning("Медленный запрос: %.1f мс, %s\n%s\n"
+                           "параметры: %r\nплан:\n%s",
+                           duration * 1000, view, sql, params, plan)
+            store(normalize(sql), params, view, plan, duration)
+        except DatabaseError:
+            logger.exception("Не удалось записать медленный запрос")
+        finally:
+            _recording.reset(token)
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else request.path
+
+
+class SlowQueryMiddleware:
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with connection.execute_wrapper(
+                SlowQueryLogger(lambda: view_name(request))):
+            return self.get_response(request)
@@ -0,0 +1,111 @@
+import base64
+import binascii
+import re
+
+from django.core.paginator import Paginator
+from django.db import connection
+
+from .models import Post
+from .pagination import KeysetPage
+
+FTS_TABLE = "posts_post_fts"
+
+
+def build_match(query):
+    """Запрос пользователя в синтаксис FTS5: все слова, последнее — префикс.
+
+    Каждое слово берётся в кавычки, поэтому операторы FTS5 из ввода
+    не интерпретируются.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def matching_ids_sql():
+    return f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+
+
+def encode_cursor(post):
+    raw = f"{post.search_rank!r}|{post.pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        rank, pk = raw.decode().rsplit("|", 1)
+        return float(rank), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class SearchPaginator(Paginator):
+    """Курсорные страницы результатов поиска, упорядоченных по bm25."""
+
+    def __init__(self, match, per_page, group_id=None, author_id=None):
+        super().__init__([], per_page)
+        self.match = match
+        self.group_id = group_id
+        self.author_id = author_id
+
+    def cursor_for(self, post):
+        return encode_cursor(post)
+
+    def get_page(self, after=None, before=None):
+        cursor = decode_cursor(after)
+        if cursor is not None:
+            rows = self._ranked(cursor)
+            return self._page(rows, has_previous=True)
+        cursor = decode_cursor(before)
+        if cursor is not None:
+            rows = self._ranked(cursor, backwards=True)
+            if len(rows) > self.per_page:
+                rows = rows[:self.per_page]
+                rows.reverse()
+                return KeysetPage(self._posts(rows), self,
+                                  has_next=True, has_previous=True)
+        return self._page(self._ranked(), has_previous=False)
+
+    def _page(self, rows, has_previous):
+        return KeysetPage(self._posts(rows[:self.per_page]), self,
+                          has_next=len(rows) > self.per_page,
+                          has_previous=has_previous)
+
+    def _ranked(self, cursor=None, backwards=False):
+        sql = [f"SELECT p.id, {FTS_TABLE}.rank FROM {FTS_TABLE} "
+               f"JOIN posts_post p ON p.id = {FTS_TABLE}.rowid "
+               f"WHERE {FTS_TABLE} MATCH %s"]
+        params = [self.match]
+        if self.group_id is not None:
+            sql.append("AND p.group_id = %s")
+            params.append(self.group_id)
+        if self.author_id is not None:
+            sql.append("AND p.author_id = %s")
+            params.append(self.author_id)
+        order, compare = ("DESC", "<") if backwards else ("ASC", ">")
+        if cursor is not None:
+            rank, pk = cursor
+            sql.append(f"AND ({FTS_TABLE}.rank {compare} %s "
+                       f"OR ({FTS_TABLE}.rank = %s AND p.id {compare} %s))")
+            params += [rank, rank, pk]
+        sql.append(f"ORDER BY {FTS_TABLE}.rank {order}, p.id {order} "
+                   "LIMIT %s")
+        params.append(self.per_page + 1)
+        with connection.cursor() as db:
+            db.execute(" ".join(sql), params)
+            return db.fetchall()
+
+    def _posts(self, rows):
+        posts = Post.objects.for_feed().in_bulk([pk for pk, _ in rows])
+        result = []
+        for pk, rank in rows:
+            if pk in posts:
+                posts[pk].search_rank = rank
+                result.append(posts[pk])
+        return result
@@ -0,0 +1,201 @@
+from django.core.cache import cache
+from django.db.models.signals import (post_delete, post_init, post_migrate,
+                                      post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import caching, follow_feed, media, tasks, timeline
+from .jobs import enqueue
+from .pagination import count_cache_key
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue(tasks.bump_author, user_id=instance.author_id, posts_count=1)
+        cache.delete(follow_feed.recent_key(instance.author_id))
+        if follow_feed.feed_source() == "timeline":
+            enqueue(tasks.fan_out, post_id=instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    enqueue(tasks.bump_author, user_id=instance.author_id, posts_count=-1)
+    cache.delete(follow_feed.recent_key(instance.author_id))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_counts_changed(sender, instance, **kwargs):
+    keys = {
+        count_cache_key("all"),
+        count_cache_key(f"group:{instance.group_id}"),
+        count_cache_key(f"author:{instance.author_id}"),
+        # Пост перенесли в другую группу: старая тоже уменьшилась.
+        # (post_versions_changed обновит _stored_group_id позже.)
+        count_cache_key(f"group:{instance._stored_group_id}"),
+    }
+    caching.expire(*keys)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue(tasks.bump_author, user_id=instance.user_id,
+                following_count=1)
+        enqueue(tasks.bump_author, user_id=instance.author_id,
+                followers_count=1)
+        cache.delete(follow_feed.following_key(instance.user_id))
+        caching.expire(
+            count_cache_key(timeline.timeline_scope(instance.user_id)))
+        if follow_feed.feed_source() == "timeline":
+            enqueue(tasks.backfill_timeline, user_id=instance.user_id,
+                    author_id=instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    enqueue(tasks.bump_author, user_id=instance.user_id, following_count=-1)
+    enqueue(tasks.bump_author, user_id=instance.author_id,
+            followers_count=-1)
+    cache.delete(follow_feed.following_key(instance.user_id))
+    caching.expire(count_cache_key(timeline.timeline_scope(instance.user_id)))
+    enqueue(tasks.remove_from_timeline, user_id=instance.user_id,
+            author_id=instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def feed_changed(sender, **kwargs):
+    caching.bump_feed_version()
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    instance._stored_group_id = instance.__dict__.get("group_id")
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_versions_changed(sender, instance, raw=False, created=True,
+                          **kwargs):
+    # post_delete не передаёт created: удаление тоже меняет состав лент.
+    if raw:
+        return
+    scopes = caching.post_scopes(instance.pk, instance.author_id,
+                                 instance.group_id)
+    groups = set()
+    if created:
+        scopes.append("list:all")
+        groups.add(instance.group_id)
+    old_group_id = instance._stored_group_id
+    if old_group_id != instance.group_id:
+        groups.update((old_group_id, instance.group_id))
+    for group_id in groups - {None}:
+        scopes += [f"group:{group_id}", f"list:group:{group_id}"]
+    caching.bump_scopes(*set(scopes))
+    instance._stored_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_versions_changed(sender, instance, raw=False, **kwargs):
+    # Счётчик в карточках меняет задача bump_comments, она же сдвигает
+    # версии ленты; здесь — только страница самого поста.
+    if instance.post_id is not None and not raw:
+        caching.bump_scopes(f"post:{instance.post_id}")
+
+
+@receiver(post_save, sender=Group)
+def group_versions_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump_scopes("all", f"group:{instance.pk}")
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # После SET_NULL посты группы уже не найти, а их карточки со ссылкой на
+    # группу остались бы в кэше до CARD_TIMEOUT: сдвигаем modified сейчас.
+    tasks.touch_group_posts(instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def group_versions_deleted(sender, instance, **kwargs):
+    # Посты группы отвязываются одним UPDATE, без сигналов.
+    caching.bump_scopes(caching.SITE_SCOPE)
+
+
+@receiver(post_migrate)
+def data_reset(sender, plan=None, **kwargs):
+    # flush и применённые миграции меняют данные в обход сигналов моделей,
+    # а кэш переживает перезапуск процессов. migrate без миграций (plan
+    # пуст) данные не трогает; flush plan не передаёт.
+    if sender.name == "posts" and (plan is None or plan):
+        cache.clear()
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_versions_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump_scopes(f"follow:{instance.user_id}",
+                            f"author:{instance.user_id}",
+                            f"author:{instance.author_id}")
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if instance.post_id is not None and not raw:
+        enqueue(tasks.bump_comments, post_id=instance.post_id,
+                delta=1 if created else 0)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id is not None:
+        enqueue(tasks.bump_comments, post_id=instance.post_id, delta=-1)
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, created, **kwargs):
+    if not created:
+        enqueue(tasks.touch_group_posts, group_id=instance.pk)
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    instance._stored_image = media.stored_name(instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_upload(sender, instance, **kwargs):
+    # Несохранённый файл запишет pre_save поля, а хранилище его забронирует.
+    instance._image_claimed = bool(instance.image) \
+        and not instance.image._committed
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, created, raw=False,
+                     update_fields=None, **kwargs):
+    if raw or update_fields is not None and "image" not in update_fields:
+        return
+    # У нового поста post_init видел ещё не сохранённую загрузку.
+    old_name = "" if created else instance._stored_image
+    media.replace(old_name, instance.image.name or "",
+                  getattr(instance, "_image_claimed", False))
+    instance._stored_image = instance.image.name or ""
+
+
+@receiver(post_delete, sender=Post)
+def post_image_deleted(sender, instance, **kwargs):
+    media.release(instance._stored_image)
@@ -0,0 +1,45 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE = 64 * 1024
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы называются по SHA-256 содержимого: одинаковые загрузки
+    хранятся (и получают превью) один раз.
+
+    Имя: <каталог upload_to>/<первые два знака хэша>/<хэш><расширение>.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        # Читаем кусками: загрузка целиком в память не нужна.
+        content.seek(0)
+        for chunk in content.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        # media импортирует модели, а модели — это хранилище.
+        from .media import claim
+        with transaction.atomic():
+            # Бронь не даёт уборке удалить файл до сохранения поста.
+            claim(name)
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length)
@@ -0,0 +1,64 @@
+"""Побочные эффекты записи, которые выполняют воркеры очереди.
+
+Задачи превью и уборки файлов — в thumbnails.py и media.py.
+
+Задачи могут выполниться с опозданием, повторно и не в том порядке, в
+каком их поставили, поэтому каждая сверяется с текущим состоянием БД.
+"""
+from django.utils import timezone
+
+from . import caching, counters, timeline
+from .jobs import task
+from .models import Follow, Post
+
+
+@task
+def bump_author(user_id, **deltas):
+    counters.bump_author(user_id, **deltas)
+    caching.bump_scopes(f"author:{user_id}", f"stats:{user_id}")
+
+
+@task
+def bump_comments(post_id, delta):
+    counters.bump_comments(post_id, delta, timezone.now())
+    post = Post.objects.filter(pk=post_id).values(
+        "author_id", "group_id").first()
+    if post is not None:
+        caching.bump_scopes(*caching.post_scopes(post_id, **post))
+    # Фрагмент главной привязан к версии ленты, а не к областям.
+    caching.bump_feed_version()
+
+
+@task
+def fan_out(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        "id", "author_id", "pub_date").first()
+    if post is not None:
+        timeline.fan_out(post)
+
+
+@task
+def backfill_timeline(user_id, author_id):
+    # Пока задача ждала, от автора могли отписаться.
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timeline.backfill(user_id, author_id)
+
+
+@task
+def remove_from_timeline(user_id, author_id):
+    # ...или подписаться снова.
+    if not Follow.objects.filter(user_id=user_id,
+                                 author_id=author_id).exists():
+        timeline.remove(user_id, author_id)
+
+
+@task
+def touch_group_posts(group_id):
+    posts = Post.objects.filter(group_id=group_id)
+    posts.update(modified=timezone.now())
+    # Название группы видно в карточках на страницах постов и авторов.
+    scopes = {"all", f"group:{group_id}"}
+    for post_id, author_id in posts.values_list("pk", "author_id"):
+        scopes.update((f"post:{post_id}", f"author:{author_id}"))
+    caching.bump_scopes(*scopes)
+    caching.bump_feed_version()
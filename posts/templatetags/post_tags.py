@@ -0,0 +1,94 @@
+from django import template
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import thumbnails
+from posts.caching import CARD_TIMEOUT, card_cache_key, fetch
+
+register = template.Library()
+
+EDIT_LINK_MARKER = "<!--post-edit-link-->"
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """Карточка поста из кэша; ссылка для автора добавляется отдельно."""
+    key = card_cache_key(post)
+    # Страница могла уже заглянуть в кэш в preload_cards.
+    if hasattr(post, "cached_card"):
+        html = post.cached_card
+    else:
+        html = cache.get(key)
+    if html is None:
+        html = render_to_string("post_card.html", {"post": post})
+        cache.set(key, html, CARD_TIMEOUT)
+    edit_link = ""
+    user = context.get("user")
+    if user is not None and user.is_authenticated \
+            and user.pk == post.author_id:
+        edit_link = render_to_string("post_edit_link.html", {"post": post})
+    return mark_safe(html.replace(EDIT_LINK_MARKER, edit_link))
+
+
+@register.simple_tag
+def preload_cards(posts):
+    """Карточки страницы одним get_many, превью для остальных — пачкой."""
+    posts = list(posts)
+    keys = {post.pk: card_cache_key(post) for post in posts}
+    cached = cache.get_many(keys.values())
+    for post in posts:
+        post.cached_card = cached.get(keys[post.pk])
+    thumbnails.preload(post for post in posts if post.cached_card is None)
+    return ""
+
+
+@register.simple_tag
+def post_image(image):
+    """Готовые превью карточки; при промахе ставит генерацию."""
+    post = getattr(image, "instance", None)
+    card = thumbnails.card_image(
+        image, getattr(post, "preloaded_thumbnails", None))
+    if card is None and image and post is not None:
+        thumbnails.generate_later(post)
+    return card
+
+
+class FragmentNode(template.Node):
+
+    def __init__(self, nodelist, timeout, name, vary_on, version):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        key = make_template_fragment_key(
+            self.name, [var.resolve(context) for var in self.vary_on])
+        version = self.version.resolve(context) if self.version else None
+        return fetch(key, lambda: self.nodelist.render(context),
+                     self.timeout.resolve(context), version)
+
+
+@register.tag
+def cache_fragment(parser, token):
+    """Как {% cache %}, но без лавины пересчётов (см. caching.fetch).
+
+    {% cache_fragment timeout name [vary_on ...] [version=value] %}:
+    смена version не меняет ключ, поэтому пока один запрос
+    перерисовывает фрагмент, остальные получают прежний.
+    """
+    nodelist = parser.parse(("endcache_fragment",))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    version = None
+    if bits[-1].startswith("version="):
+        version = parser.compile_filter(bits.pop()[len("version="):])
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 2 arguments.")
+    return FragmentNode(nodelist, parser.compile_filter(bits[1]), bits[2],
+                        [parser.compile_filter(bit) for bit in bits[3:]],
+                        version)
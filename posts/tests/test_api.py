@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Толстой', slug='tolstoy',
+                                         description='Лев Толстой')
+        for i in range(25):
+            Post.objects.create(text=f'Пост {i}', author=cls.user,
+                                group=cls.group if i % 2 else None)
+        cls.post = Post.objects.create(text='Последний', author=cls.reader)
+        for i in range(3):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Коммент {i}')
+        cls.expected = list(Post.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = Client()
+
+    def get(self, url, status=200, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.json()
+
+    def walk(self, url, **params):
+        data = self.get(url, **params)
+        ids = [row['id'] for row in data['results']]
+        while data['next']:
+            data = self.get(url, after=data['next'], **params)
+            ids += [row['id'] for row in data['results']]
+        return ids
+
+    def test_global_feed_pages(self):
+        url = reverse('api:posts')
+        self.assertEqual(self.walk(url), self.expected)
+        self.assertEqual(self.walk(url, limit=7), self.expected)
+        first = self.get(url)
+        second = self.get(url, after=first['next'])
+        back = self.get(url, before=second['previous'])
+        self.assertEqual(back['results'], first['results'])
+        self.assertEqual(first['results'][0], {
+            'id': self.post.id, 'text': 'Последний',
+            'pub_date': first['results'][0]['pub_date'],
+            'author': 'Reader', 'group': None, 'image': None,
+            'comment_count': 3})
+
+    def test_field_selection(self):
+        data = self.get(reverse('api:posts'), fields='id,author')
+        self.assertEqual(data['results'][0],
+                         {'id': self.post.id, 'author': 'Reader'})
+        self.assertIsNotNone(data['next'])
+        self.get(reverse('api:posts'), status=400, fields='id,password')
+
+    def test_group_and_author_feeds(self):
+        ids = self.walk(reverse('api:group_posts', args=['tolstoy']))
+        self.assertEqual(ids, list(self.group.posts.order_by(
+            '-pub_date', '-id').values_list('id', flat=True)))
+        ids = self.walk(reverse('api:author_posts', args=['Reader']))
+        self.assertEqual(ids, [self.post.id])
+        self.get(reverse('api:group_posts', args=['nope']), status=404)
+        self.get(reverse('api:author_posts', args=['nobody']), status=404)
+
+    def test_follow_feed(self):
+        self.get(reverse('api:follow'), status=401)
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.client.force_login(self.reader)
+        expected = list(self.user.posts.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+        self.assertEqual(self.walk(reverse('api:follow')), expected)
+        with override_settings(FOLLOW_FEED_SOURCE='join'):
+            self.assertEqual(self.walk(reverse('api:follow')), expected)
+
+    def test_post_with_comments(self):
+        data = self.get(reverse('api:post', args=[self.post.id]),
+                        fields='id,text')
+        self.assertEqual(data['text'], 'Последний')
+        self.assertNotIn('author', data)
+        self.assertEqual([row['text'] for row in data['comments']['results']],
+                         ['Коммент 2', 'Коммент 1', 'Коммент 0'])
+        self.assertIsNone(data['comments']['next'])
+        data = self.get(reverse('api:comments', args=[self.post.id]),
+                        limit=2)
+        self.assertEqual(len(data['results']), 2)
+        self.get(reverse('api:post', args=[0]), status=404)
+        self.get(reverse('api:comments', args=[0]), status=404)
+
+    def test_read_only_and_one_query_per_page(self):
+        response = self.client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
+        first = self.get(reverse('api:posts'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api:posts'), {'after': first['next']})
+        with self.assertNumQueries(2):
+            self.client.get(reverse('api:post', args=[self.post.id]))
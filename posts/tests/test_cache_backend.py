@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from yatube.cache import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.backend()
+
+    def backend(self, **options):
+        # Отдельный экземпляр — как кэш другого процесса.
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        cache = self.cache
+        cache.set('a', {'x': 1})
+        self.assertEqual(cache.get('a'), {'x': 1})
+        self.assertIsNone(cache.get('missing'))
+        self.assertFalse(cache.add('a', 2))
+        self.assertTrue(cache.add('b', 2))
+        self.assertEqual(cache.incr('b', 3), 5)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        self.assertEqual(cache.get_many(['a', 'b', 'c']),
+                         {'a': {'x': 1}, 'b': 5})
+        cache.delete('a')
+        self.assertFalse(cache.has_key('a'))
+        cache.set('short', 1, 0)
+        self.assertIsNone(cache.get('short'))
+        self.assertTrue(cache.touch('b', None))
+        cache.clear()
+        self.assertEqual(cache.get_many(['a', 'b']), {})
+
+    def test_expiry(self):
+        self.cache.set('a', 1, 10)
+        with mock.patch('yatube.cache.time.time',
+                        return_value=time.time() + 11):
+            self.assertIsNone(self.backend().get('a'))
+            self.assertTrue(self.cache.add('a', 2))
+
+    def test_writes_reach_other_processes(self):
+        other = self.backend(LOCAL_TIMEOUT=60)
+        self.cache.set('a', 1)
+        self.assertEqual(other.get('a'), 1)
+        self.assertIsNone(other.get('b'))
+        self.cache.set('a', 2)
+        self.cache.set('b', 3)
+        self.assertEqual(other.get_many(['a', 'b']), {'a': 2, 'b': 3})
+        self.cache.delete('a')
+        self.assertIsNone(other.get('a'))
+        self.cache.clear()
+        self.assertIsNone(other.get('b'))
+        # add из другого процесса видит запись, а не свой промах в LRU.
+        self.assertTrue(self.cache.add('lock', 1))
+        self.assertFalse(other.add('lock', 1))
+
+    def test_local_copy_is_served_until_it_expires(self):
+        cache = self.backend(LOCAL_TIMEOUT=60)
+        cache.set('a', 1)
+        # Запись мимо бэкенда не попадает в журнал инвалидаций.
+        with sqlite3.connect(self.path) as connection:
+            connection.execute('DELETE FROM cache_entry')
+        self.assertEqual(cache.get('a'), 1)
+        with mock.patch('yatube.cache.time.time',
+                        return_value=time.time() + 61):
+            self.assertIsNone(cache.get('a'))
+
+    @mock.patch('yatube.cache.CULL_EVERY', 1)
+    def test_cull(self):
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 9}})
+        cache.set_many({f'k{i}': i for i in range(10)})
+        with sqlite3.connect(self.path) as connection:
+            count = connection.execute(
+                'SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+        self.assertLess(count, 10)
@@ -0,0 +1,120 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management.sql import emit_post_migrate_signal
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from posts.caching import expire, fetch, lock_key, stale_reads
+from posts.models import Post
+
+
+User = get_user_model()
+
+
+class FetchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='new'):
+        def compute():
+            self.calls += 1
+            return value
+        return compute
+
+    def test_computes_once(self):
+        self.assertEqual(fetch('key', self.compute(), 60), 'new')
+        self.assertEqual(fetch('key', self.compute('other'), 60), 'new')
+        self.assertEqual(self.calls, 1)
+        self.assertIsNone(cache.get(lock_key('key')))
+
+    def test_early_expiration(self):
+        # Пересчёт «стоил» 100 секунд, до срока — одна: пора обновить.
+        cache.set('key', ('old', None, time.time() + 1, 100.0), 60)
+        with mock.patch('posts.caching.random.random', return_value=0.5):
+            self.assertEqual(fetch('key', self.compute(), 60), 'new')
+        cache.set('key', ('old', None, time.time() + 1, 0.0), 60)
+        with mock.patch('posts.caching.random.random', return_value=0.5):
+            self.assertEqual(fetch('key', self.compute(), 60), 'old')
+
+    def test_stale_while_revalidate(self):
+        cache.set('key', ('old', 1, time.time() + 60, 0.0), 60)
+        cache.add(lock_key('key'), 1)
+        reads = stale_reads()
+        # Версия сменилась, но пересчитывает другой запрос.
+        self.assertEqual(fetch('key', self.compute(), 60, version=2), 'old')
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(stale_reads(), reads + 1)
+        cache.delete(lock_key('key'))
+        self.assertEqual(fetch('key', self.compute(), 60, version=2), 'new')
+
+    @mock.patch('posts.caching.LOCK_WAIT', 0.1)
+    def test_waits_for_lock_without_value(self):
+        cache.add(lock_key('key'), 1)
+        self.assertEqual(fetch('key', self.compute(), 60), 'new')
+        self.assertEqual(self.calls, 1)
+        # Чужую блокировку не снимаем.
+        self.assertIsNotNone(cache.get(lock_key('key')))
+
+    def test_expire_keeps_value_for_others(self):
+        fetch('key', self.compute('old'), 60)
+        expire('key', 'missing')
+        self.assertIsNone(cache.get('missing'))
+        cache.add(lock_key('key'), 1)
+        self.assertEqual(fetch('key', self.compute(), 60), 'old')
+        cache.delete(lock_key('key'))
+        self.assertEqual(fetch('key', self.compute(), 60), 'new')
+
+
+class StaleFragmentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Writer')
+        Post.objects.create(text='Старый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_stale_page_is_neither_cached_nor_validated(self):
+        url = reverse('index')
+        self.client.get(url)
+        Post.objects.create(text='Новый пост', author=self.author)
+        # Фрагмент перерисовывает другой запрос — отдан прежний.
+        fragment = make_template_fragment_key('index_page', ['||', None])
+        cache.add(lock_key(fragment), 1)
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Новый пост')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertNotContains(self.client.get(url), 'Новый пост')
+        cache.delete(lock_key(fragment))
+        response = self.client.get(url)
+        self.assertContains(response, 'Новый пост')
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_profile_fragment_follows_author_version(self):
+        url = reverse('profile', kwargs={'username': 'Writer'})
+        self.assertContains(self.client.get(url), 'Старый пост')
+        Post.objects.create(text='Новый пост', author=self.author)
+        self.assertContains(self.client.get(url), 'Новый пост')
+
+
+class DataResetTests(TestCase):
+
+    def test_tests_use_own_cache(self):
+        self.assertEqual(settings.CACHES['default']['LOCATION'], ':memory:')
+
+    def test_cache_cleared_only_when_data_changes(self):
+        cache.set('kept', 1)
+        emit_post_migrate_signal(0, False, 'default', plan=[])
+        self.assertEqual(cache.get('kept'), 1)
+        # flush передаёт сигнал без plan.
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertIsNone(cache.get('kept'))
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Толстой', slug='tolstoy',
+                                         description='Лев Толстой')
+        cls.other_group = Group.objects.create(title='Чехов', slug='chekhov',
+                                               description='А. П. Чехов')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def revalidate(self, url, client=None):
+        """Статус повторного запроса с валидаторами первого ответа."""
+        client = client or self.client
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified_without_queries_or_templates(self):
+        url = reverse('index')
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            repeat = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.templates, [])
+        self.assertEqual(repeat['ETag'], response['ETag'])
+        repeat = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_writes_change_validators(self):
+        url = reverse('index')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(text='Новый', author=self.reader)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_group_scope(self):
+        url = reverse('group', kwargs={'slug': 'tolstoy'})
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(text='Чужая группа', author=self.author,
+                            group=self.other_group)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Пост переехал в другую группу — старая страница тоже меняется.
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        missing = reverse('group', kwargs={'slug': 'nope'})
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_post_page_follows_comments(self):
+        url = reverse('post', kwargs={'username': 'Writer',
+                                      'post_id': self.post.id})
+        self.assertEqual(self.revalidate(url).status_code, 304)
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.reader, text='К')
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_profile_and_follow_feed_depend_on_viewer(self):
+        reader = Client()
+        reader.force_login(self.reader)
+        profile = reverse('profile', kwargs={'username': 'Writer'})
+        feed = reverse('follow_index')
+        response = self.revalidate(profile, reader)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('private', reader.get(profile)['Cache-Control'])
+        self.assertNotEqual(self.client.get(profile)['ETag'],
+                            reader.get(profile)['ETag'])
+
+        profile_etag = reader.get(profile)['ETag']
+        feed_etag = reader.get(feed)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(reader.get(
+            profile, HTTP_IF_NONE_MATCH=profile_etag).status_code, 200)
+        self.assertEqual(reader.get(
+            feed, HTTP_IF_NONE_MATCH=feed_etag).status_code, 200)
+
+        feed_etag = reader.get(feed)['ETag']
+        self.assertEqual(reader.get(
+            feed, HTTP_IF_NONE_MATCH=feed_etag).status_code, 304)
+        Post.objects.create(text='Для подписчиков', author=self.author)
+        self.assertEqual(reader.get(
+            feed, HTTP_IF_NONE_MATCH=feed_etag).status_code, 200)
@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from posts.counters import stats_for
+from posts.models import AuthorStats, Comment, Post
+from posts.tests.utils import QueryBudgetMixin
+
+
+User = get_user_model()
+
+
+class CounterTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        stats_for(self.author)
+        stats_for(self.reader)
+        self.author_client.post(reverse('new_post'), {'text': 'Пост'})
+        post = Post.objects.get()
+        self.reader_client.post(
+            reverse('add_comment', kwargs={'username': self.author,
+                                           'post_id': post.id}),
+            {'text': 'Коммент'})
+        self.reader_client.get(reverse('profile_follow',
+                                       kwargs={'username': self.author}))
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+        self.reader_client.get(reverse('profile_unfollow',
+                                       kwargs={'username': self.author}))
+        Comment.objects.all().delete()
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_profile_reads_stored_counters(self):
+        Post.objects.create(text='Пост', author=self.author)
+        stats_for(self.author)
+        url = reverse('profile', kwargs={'username': self.author})
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'Записей: 1')
+        with self.assertMaxQueries(100) as context:
+            self.reader_client.get(url)
+        for query in context.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+
+    def test_recount_repairs_drift(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='К')
+        stats_for(self.author)
+        Post.objects.update(comment_count=7)
+        AuthorStats.objects.update(posts_count=5)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        call_command('recount', '--batch-size', '1', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.reader).posts_count, 0)
@@ -0,0 +1,99 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.exporter import export_records
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='leo')
+        cls.other = User.objects.create_user(username='anna')
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Про котов')
+        cls.post = Post.objects.create(text='Мой пост', author=cls.user,
+                                       group=cls.group)
+        cls.foreign = Post.objects.create(text='Чужой', author=cls.other)
+        Comment.objects.create(post=cls.foreign, author=cls.user,
+                               text='Мой комментарий')
+        Comment.objects.create(post=cls.post, author=cls.other,
+                               text='Чужой комментарий')
+        Follow.objects.create(user=cls.user, author=cls.other)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def download(self, **params):
+        response = self.client.get(reverse('export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_own_data_as_jsonl(self):
+        records = [json.loads(line)
+                   for line in self.download().decode().splitlines()]
+        self.assertEqual([record['type'] for record in records],
+                         ['group', 'post', 'comment', 'follow'])
+        self.assertEqual(records[1]['text'], 'Мой пост')
+        self.assertEqual(records[2]['text'], 'Мой комментарий')
+        self.assertEqual(records[3], {'type': 'follow', 'user': 'leo',
+                                      'author': 'anna'})
+
+    def test_csv_gzip(self):
+        data = gzip.decompress(self.download(format='csv', gzip=1))
+        rows = list(csv.DictReader(data.decode().splitlines()))
+        self.assertEqual(rows[1]['text'], 'Мой пост')
+        self.assertEqual(rows[1]['group'], 'cats')
+
+    def test_site_dump_is_for_staff_only(self):
+        response = self.client.get(reverse('export'), {'scope': 'all'})
+        self.assertEqual(response.status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        lines = self.download(scope='all').decode().splitlines()
+        self.assertEqual(len(lines), 1 + 2 + 2 + 1)
+
+    def test_anonymous_is_redirected(self):
+        response = Client().get(reverse('export'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_reads_in_keyset_batches(self):
+        for i in range(5):
+            Post.objects.create(text=f'Пост {i}', author=self.user)
+        with CaptureQueriesContext(connection) as context:
+            posts = [record for record in export_records(batch_size=2)
+                     if record['type'] == 'post']
+        self.assertEqual(len(posts), 7)
+        selects = [query['sql'] for query in context.captured_queries
+                   if 'FROM "posts_post"' in query['sql']]
+        self.assertEqual(len(selects), 4)
+        self.assertTrue(all('LIMIT 2' in sql for sql in selects))
+
+    def test_command_round_trip(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'dump.jsonl')
+        call_command('export_yatube', '--output', path, '--batch-size', '1')
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        call_command('import_yatube', path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
@@ -0,0 +1,78 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post, Follow
+
+
+User = get_user_model()
+
+
+@override_settings(FOLLOW_FEED_SOURCE='pull')
+class PullFeedTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        authors = [User.objects.create_user(username=f'Writer{i}')
+                   for i in range(3)]
+        for i in range(24):
+            Post.objects.create(text=f'Пост {i}', author=authors[i % 3])
+        Post.objects.create(text='Не в ленте',
+                            author=User.objects.create_user(username='X'))
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.expected = list(Post.objects.filter(
+            author__following__user=cls.reader).order_by(
+                '-pub_date', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client_reader = Client()
+        self.client_reader.force_login(self.reader)
+
+    def walk(self):
+        ids = []
+        params = {}
+        while True:
+            response = self.client_reader.get(reverse('follow_index'),
+                                              params)
+            page = response.context['page']
+            ids += [post.id for post in page]
+            if not page.has_next():
+                return ids, page
+            params = {'after': page.next_cursor}
+
+    def test_merge_matches_join(self):
+        ids, last_page = self.walk()
+        self.assertEqual(ids, self.expected)
+        response = self.client_reader.get(
+            reverse('follow_index'), {'before': last_page.previous_cursor})
+        self.assertEqual([post.id for post in response.context['page']],
+                         self.expected[10:20])
+
+    def test_warm_cache_skips_join(self):
+        self.walk()
+        with CaptureQueriesContext(connection) as queries:
+            self.walk()
+        for query in queries.captured_queries:
+            self.assertNotIn('posts_follow', query['sql'])
+
+    def test_new_post_invalidates_author_list(self):
+        self.walk()
+        post = Post.objects.create(text='Свежий',
+                                   author=User.objects.get(
+                                       username='Writer1'))
+        ids, _ = self.walk()
+        self.assertEqual(ids[0], post.id)
+
+    @mock.patch('posts.follow_feed.RECENT_SIZE', 3)
+    def test_falls_back_below_cached_window(self):
+        ids, _ = self.walk()
+        self.assertEqual(ids, self.expected)
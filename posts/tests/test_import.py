@@ -0,0 +1,160 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class ImportTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.reader = User.objects.create_user(username='reader')
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+    def jsonl(self, name, records):
+        return self.write(name, ''.join(json.dumps(record) + '\n'
+                                        for record in records))
+
+    def run_import(self, *paths, batch_size=2):
+        out = StringIO()
+        call_command('import_yatube', *paths, '--batch-size',
+                     str(batch_size), stdout=out)
+        return out.getvalue()
+
+    def records(self):
+        return [
+            {'type': 'group', 'slug': 'cats', 'title': 'Коты',
+             'description': 'Про котов'},
+            {'type': 'post', 'id': 10, 'text': 'Первый', 'author': 'leo',
+             'group': 'cats', 'pub_date': '2019-05-01T10:00:00+00:00'},
+            {'type': 'post', 'id': 11, 'text': 'Второй', 'author': 'leo',
+             'pub_date': '2019-05-02T10:00:00'},
+            {'type': 'comment', 'post': 10, 'author': 'reader',
+             'text': 'Мяу', 'created': '2019-05-03T10:00:00'},
+            {'type': 'comment', 'post': 99, 'author': 'reader',
+             'text': 'Потерянный'},
+            {'type': 'follow', 'user': 'reader', 'author': 'leo'},
+        ]
+
+    def test_import_and_rebuild(self):
+        out = self.run_import(self.jsonl('data.jsonl', self.records()))
+        self.assertIn('строк/с', out)
+        self.assertIn('Записано: 4, пропущено: 1', out)
+        leo = User.objects.get(username='leo')
+        self.assertFalse(leo.has_usable_password())
+        first = Post.objects.get(text='Первый')
+        self.assertEqual(first.group, Group.objects.get(slug='cats'))
+        self.assertEqual(first.pub_date.year, 2019)
+        self.assertEqual(first.comment_count, 1)
+        self.assertEqual(Comment.objects.get().created.day, 3)
+        self.assertEqual(AuthorStats.objects.get(user=leo).posts_count, 2)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.reader).following_count, 1)
+        self.assertEqual(self.reader.timeline.count(), 2)
+
+    def test_csv_input(self):
+        path = self.write('posts.csv', 'type,id,text,author,group\n'
+                                       'post,1,Из CSV,leo,\n')
+        self.run_import(path)
+        self.assertEqual(Post.objects.get().text, 'Из CSV')
+
+    def test_resume_after_failure(self):
+        records = self.records()
+        lines = [json.dumps(record) for record in records]
+        path = self.write('data.jsonl', '\n'.join(
+            lines[:4] + ['{битая строка'] + lines[5:]) + '\n')
+        with self.assertRaisesMessage(CommandError,
+                                      f'{path}, запись 5: не JSON'):
+            self.run_import(path)
+        # Первые две пачки записаны и при повторе не дублируются.
+        self.assertEqual(Post.objects.count(), 2)
+        self.jsonl('data.jsonl', records)
+        self.run_import(path)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_resume_rebuilds_earlier_batches(self):
+        records = self.records()
+        records.insert(1, records.pop())
+        lines = [json.dumps(record) for record in records]
+        path = self.write('data.jsonl', '\n'.join(
+            lines[:4] + ['{битая строка'] + lines[5:]) + '\n')
+        with self.assertRaises(CommandError):
+            self.run_import(path)
+        # Подписка и посты записаны до сбоя, повтор их не встречает.
+        self.jsonl('data.jsonl', records)
+        self.run_import(path)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.reader.timeline.count(), 2)
+        leo = User.objects.get(username='leo')
+        self.assertEqual(AuthorStats.objects.get(user=leo).posts_count, 2)
+
+    def test_ids_of_deleted_posts_are_not_reused(self):
+        author = User.objects.create_user(username='leo')
+        Post.objects.create(text='Старый', author=author)
+        deleted = Post.objects.create(text='Удалённый', author=author).pk
+        Post.objects.filter(pk=deleted).delete()
+        self.run_import(self.jsonl('data.jsonl', self.records()))
+        ids = list(Post.objects.filter(
+            text__in=['Первый', 'Второй']).values_list('id', flat=True))
+        self.assertEqual(len(ids), 2)
+        self.assertTrue(all(pk > deleted for pk in ids))
+        # Следующий обычный пост идёт после импортированных.
+        self.assertGreater(
+            Post.objects.create(text='Новый', author=author).pk, max(ids))
+
+    def test_unknown_record_type(self):
+        records = self.records()
+        records[3] = {'type': 'like', 'post': 10}
+        path = self.jsonl('data.jsonl', records)
+        with self.assertRaisesMessage(CommandError,
+                                      f"{path}, запись 4: неизвестный тип "
+                                      f"записи 'like'"):
+            self.run_import(path)
+        # Пачка с ошибочной записью не записана, предыдущие — на месте.
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_invalid_records_name_file_and_record(self):
+        cases = [
+            ({'type': 'post', 'id': 12, 'author': 'leo'}, "нет поля 'text'"),
+            ({'type': 'comment', 'post': 10, 'author': 'leo', 'text': 'Да',
+              'created': 'вчера'}, "неверная дата created='вчера'"),
+            ({'type': 'post', 'id': 12, 'text': 'Т', 'author': 'leo',
+              'pub_date': '2019-13-01T10:00:00'}, 'неверная дата pub_date'),
+        ]
+        for record, message in cases:
+            path = self.jsonl('bad.jsonl', [record])
+            with self.subTest(message=message), self.assertRaisesMessage(
+                    CommandError, f'{path}, запись 1: {message}'):
+                self.run_import(path)
+
+    def test_dates_do_not_change_model_fields(self):
+        self.run_import(self.jsonl('data.jsonl', self.records()))
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+        self.assertEqual(Post.objects.get(text='Второй').pub_date.day, 2)
+        post = Post.objects.create(text='Сейчас', author=self.reader)
+        self.assertGreater(post.pub_date.year, 2019)
+
+    def test_rerun_does_not_duplicate(self):
+        path = self.jsonl('data.jsonl', self.records())
+        self.run_import(path)
+        copy = self.jsonl('copy.jsonl', self.records()[:3])
+        self.run_import(copy)
+        self.assertEqual(Post.objects.count(), 2)
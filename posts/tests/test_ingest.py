@@ -0,0 +1,92 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from posts.forms import PostForm
+from posts.ingest import ingest_image
+
+
+def jpeg_upload(size=(40, 20), exif=None, name='photo.jpeg'):
+    buffer = BytesIO()
+    params = {'exif': exif} if exif is not None else {}
+    Image.new('RGB', size, (200, 10, 10)).save(buffer, 'JPEG', **params)
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+class IngestTests(SimpleTestCase):
+
+    def form(self, upload):
+        return PostForm({'text': 'Картинка'}, {'image': upload})
+
+    def open(self, upload):
+        return Image.open(BytesIO(upload.read()))
+
+    def test_exif_orientation_applied_and_metadata_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: повернуть на 90°
+        exif[0x010f] = 'Camera maker'
+        result = self.open(ingest_image(jpeg_upload(exif=exif.tobytes())))
+        self.assertEqual(result.size, (20, 40))
+        self.assertEqual(dict(result.getexif()), {})
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_oversized_original_is_downscaled(self):
+        upload = ingest_image(jpeg_upload(size=(800, 400), name='big.JPG'))
+        self.assertEqual(upload.name, 'big.jpg')
+        self.assertEqual(self.open(upload).size, (100, 50))
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_animation_downscaled_per_frame_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x010f] = 'Camera maker'
+        frames = [Image.new('RGB', (400, 200), color)
+                  for color in ((255, 0, 0), (0, 255, 0), (0, 0, 255))]
+        for format_ in ('GIF', 'WEBP', 'PNG'):
+            buffer = BytesIO()
+            frames[0].save(buffer, format_, save_all=True,
+                           append_images=frames[1:], duration=50, loop=0,
+                           exif=exif.tobytes())
+            upload = ingest_image(SimpleUploadedFile(
+                f'anim.{format_.lower()}', buffer.getvalue()))
+            result = self.open(upload)
+            self.assertEqual(result.format, format_)
+            self.assertEqual(result.n_frames, 3)
+            self.assertEqual(result.size, (100, 50))
+            self.assertEqual(dict(result.getexif()), {})
+
+    @override_settings(IMAGE_MAX_PIXELS=2500)
+    def test_animation_pixel_limit_counts_all_frames(self):
+        frames = [Image.new('RGB', (20, 20), (i * 40, 0, 0))
+                  for i in range(7)]
+        buffer = BytesIO()
+        frames[0].save(buffer, 'GIF', save_all=True,
+                       append_images=frames[1:], duration=50)
+        form = self.form(SimpleUploadedFile('anim.gif', buffer.getvalue()))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    def test_other_formats_become_png(self):
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, 'BMP')
+        upload = ingest_image(SimpleUploadedFile('old.bmp',
+                                                 buffer.getvalue()))
+        self.assertEqual(upload.name, 'old.png')
+        self.assertEqual(self.open(upload).format, 'PNG')
+
+    @override_settings(IMAGE_MAX_PIXELS=500)
+    def test_pixel_limit_checked_from_header(self):
+        form = self.form(jpeg_upload(size=(40, 20)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_file_size_limit(self):
+        form = self.form(jpeg_upload())
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_large')
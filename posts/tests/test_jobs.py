@@ -0,0 +1,169 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import jobs
+from posts.jobs import enqueue, task
+from posts.models import AuthorStats, Group, Job, Post
+
+
+User = get_user_model()
+
+calls = []
+
+
+@task
+def remember(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def flaky(value):
+    calls.append(value)
+    if calls.count(value) == 1:
+        raise ValueError('первая попытка')
+
+
+@task(max_attempts=1)
+def broken():
+    raise ValueError('всегда')
+
+
+@mock.patch('posts.jobs.eager', return_value=False)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def run_workers(self):
+        out = StringIO()
+        call_command('run_workers', '--once', '--processes', '1', stdout=out)
+        return out.getvalue()
+
+    def test_enqueue_only_stores_job(self, eager):
+        job = enqueue(remember, value=1)
+        self.assertEqual(calls, [])
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertIn('Выполнено задач: 1', self.run_workers())
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_idempotency_key(self, eager):
+        self.assertIsNotNone(enqueue(remember, key='once', value=1))
+        self.assertIsNone(enqueue(remember, key='once', value=2))
+        self.run_workers()
+        self.assertIsNone(enqueue(remember, key='once', value=3))
+        self.run_workers()
+        self.assertEqual(calls, [1])
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+    def test_retry_with_backoff(self, eager):
+        job = enqueue(flaky, value='x')
+        with self.assertLogs('posts.jobs', 'ERROR'):
+            self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertIn('первая попытка', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        Job.objects.update(run_at=timezone.now())
+        self.run_workers()
+        self.assertEqual(calls, ['x', 'x'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_gives_up_after_max_attempts(self, eager):
+        job = enqueue(broken)
+        with self.assertLogs('posts.jobs', 'ERROR'):
+            self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+
+    def test_old_done_jobs_are_purged(self, eager):
+        enqueue(remember, key='old', value=1)
+        enqueue(remember, key='recent', value=2)
+        self.run_workers()
+        Job.objects.filter(key='old').update(
+            run_at=timezone.now() - timedelta(days=8))
+        self.run_workers()
+        self.assertEqual(list(Job.objects.values_list('key', flat=True)),
+                         ['recent'])
+
+    def test_stale_lock_is_reclaimed(self, eager):
+        enqueue(remember, value=1)
+        Job.objects.update(status=Job.RUNNING, locked_by='dead:1',
+                           locked_at=timezone.now() - timedelta(hours=1))
+        self.run_workers()
+        self.assertEqual(calls, [1])
+
+    def test_views_only_enqueue_side_effects(self, eager):
+        author = User.objects.create_user(username='Writer')
+        reader = User.objects.create_user(username='Reader')
+        client = Client()
+        client.force_login(author)
+        client.post(reverse('new_post'), {'text': 'Пост'})
+        client.force_login(reader)
+        client.get(reverse('profile_follow', kwargs={'username': author}))
+        self.assertEqual(AuthorStats.objects.get(user=author).posts_count,
+                         0)
+        self.assertEqual(reader.timeline.count(), 0)
+        self.assertTrue(Job.objects.exists())
+
+        self.run_workers()
+        self.assertEqual(AuthorStats.objects.get(user=author).posts_count,
+                         1)
+        self.assertEqual(
+            AuthorStats.objects.get(user=author).followers_count, 1)
+        self.assertEqual([entry.post_id for entry in reader.timeline.all()],
+                         [Post.objects.get().pk])
+
+    def test_out_of_order_timeline_jobs(self, eager):
+        author = User.objects.create_user(username='Writer')
+        reader = User.objects.create_user(username='Reader')
+        Post.objects.create(text='Пост', author=author)
+        client = Client()
+        client.force_login(reader)
+        client.get(reverse('profile_follow', kwargs={'username': author}))
+        client.get(reverse('profile_unfollow', kwargs={'username': author}))
+        # Отписка обработана раньше подписки — в ленте ничего не остаётся.
+        Job.objects.filter(name='posts.tasks.remove_from_timeline').update(
+            run_at=timezone.now() - timedelta(minutes=1))
+        self.run_workers()
+        self.assertEqual(reader.timeline.count(), 0)
+
+    def test_feed_sees_results_of_jobs(self, eager):
+        cache.clear()
+        author = User.objects.create_user(username='Writer')
+        group = Group.objects.create(title='Старое', slug='group',
+                                     description='Описание')
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        self.run_workers()
+        client = Client()
+        client.force_login(author)
+        client.get(reverse('index'))
+        client.post(reverse('add_comment', kwargs={
+            'username': author.username, 'post_id': post.pk}),
+            {'text': 'Комментарий'})
+        group.title = 'Новое'
+        group.save()
+        # Страница, собранная до воркера, не должна пережить его задачи.
+        self.assertNotContains(client.get(reverse('index')),
+                               'Комментариев: 1')
+        self.run_workers()
+        response = client.get(reverse('index'))
+        self.assertContains(response, 'Комментариев: 1')
+        self.assertContains(response, 'Новое')
+
+
+class EagerModeTests(TestCase):
+
+    def test_in_memory_database_runs_jobs_inline(self):
+        self.assertTrue(jobs.eager())
+        enqueue(remember, value='сразу')
+        self.assertIn('сразу', calls)
+        self.assertFalse(Job.objects.exists())
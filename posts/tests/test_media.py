@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase, Client, override_settings
+from django.urls import reverse
+
+from posts import media, thumbnails
+from posts.models import MediaFile, Post
+from posts.tests.utils import uploaded_image
+
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedMediaTests(TransactionTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='StasBasov')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, color):
+        return Post.objects.create(text='Мем', author=self.user,
+                                   image=uploaded_image('meme.png', color))
+
+    def refs(self, name):
+        return MediaFile.objects.get(name=name).refs
+
+    def test_identical_uploads_share_file(self):
+        first = self.create_post(color=1)
+        second = self.create_post(color=1)
+        other = self.create_post(color=2)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertRegex(first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}'
+                                           r'\.png$')
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(first.image.path))), 1)
+        self.assertEqual(self.refs(first.image.name), 2)
+        self.assertEqual(
+            thumbnails.thumbnail_file(first.image, (320, 'WEBP')).name,
+            thumbnails.thumbnail_file(second.image, (320, 'WEBP')).name)
+
+    def test_file_removed_with_last_reference(self):
+        first = self.create_post(color=3)
+        second = self.create_post(color=3)
+        thumbnails.generate(first.image)
+        thumbnail = thumbnails.lookup(first.image, (320, 'WEBP'))
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.refs(second.image.name), 1)
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(thumbnail.exists())
+        self.assertFalse(MediaFile.objects.exists())
+
+    @mock.patch('posts.forms.thumbnails.generate_later')
+    def test_edit_releases_replaced_image(self, generate_later):
+        post = self.create_post(color=4)
+        old_path = post.image.path
+        self.client.post(
+            reverse('post_edit', kwargs={'username': self.user,
+                                         'post_id': post.id}),
+            {'text': 'Новый мем', 'image': uploaded_image('new.png', 5)})
+        post.refresh_from_db()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(self.refs(post.image.name), 1)
+        self.assertEqual(MediaFile.objects.count(), 1)
+
+    def test_upload_of_existing_file_survives_collect(self):
+        post = self.create_post(color=7)
+        name, path = post.image.name, post.image.path
+        storage = Post._meta.get_field('image').storage
+        # Вторая загрузка нашла файл, а пост ещё не сохранила.
+        self.assertEqual(
+            storage.save('posts/meme.png', uploaded_image('meme.png', 7)),
+            name)
+        post.delete()
+        self.assertTrue(os.path.exists(path))
+        media.acquire(name, claimed=True)
+        self.assertEqual(self.refs(name), 1)
+        self.assertEqual(MediaFile.objects.get(name=name).pending, 0)
+
+    @mock.patch('posts.forms.thumbnails.generate_later')
+    def test_same_image_edit_releases_claim(self, generate_later):
+        post = self.create_post(color=8)
+        name, path = post.image.name, post.image.path
+        self.client.post(
+            reverse('post_edit', kwargs={'username': self.user,
+                                         'post_id': post.id}),
+            {'text': 'Тот же мем', 'image': uploaded_image('meme.png', 8)})
+        file = MediaFile.objects.get(name=name)
+        self.assertEqual((file.refs, file.pending), (1, 0))
+        Post.objects.get(pk=post.pk).delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaFile.objects.exists())
+
+    def test_recount_repairs_refs(self):
+        post = self.create_post(color=6)
+        MediaFile.objects.update(refs=7)
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.refs(post.image.name), 1)
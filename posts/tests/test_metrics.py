@@ -0,0 +1,89 @@
+import re
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from posts.tests.utils import uploaded_image
+from yatube import metrics
+
+
+User = get_user_model()
+
+
+def server_timing(response):
+    """{метрика: {параметр: значение}} из заголовка Server-Timing."""
+    timings = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        timings[name] = dict(param.split('=', 1) for param in params)
+    return timings
+
+
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Writer')
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.__init__()
+        self.client = Client()
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('profile',
+                                               kwargs={'username': 'Writer'}))
+        timings = server_timing(response)
+        self.assertEqual(timings['sql']['desc'], f'"{len(context)} queries"')
+        self.assertGreater(float(timings['tpl']['dur']), 0)
+        self.assertGreaterEqual(float(timings['total']['dur']),
+                                float(timings['sql']['dur']))
+        _, misses = re.findall(r'\d+', timings['cache']['desc'])
+        self.assertGreater(int(misses), 0)
+
+    def test_thumbnail_time(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.client.force_login(self.user)
+        with override_settings(MEDIA_ROOT=media):
+            response = self.client.post(reverse('new_post'), {
+                'text': 'С картинкой', 'image': uploaded_image()})
+        self.assertGreater(float(server_timing(response)['thumb']['dur']), 0)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        response = Client(REMOTE_ADDR='10.0.0.5').get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      text)
+        self.assertIn('yatube_request_duration_seconds_count{view="index"} 2',
+                      text)
+        self.assertIn(
+            'yatube_sql_queries_bucket{view="index",le="+Inf"} 2', text)
+        self.assertRegex(
+            text, r'yatube_cache_requests_total\{view="index",'
+                  r'result="miss"\} \d+')
+
+        response = Client(REMOTE_ADDR='10.0.0.1').get('/metrics')
+        self.assertEqual(response.status_code, 404)
+
+    def test_metrics_are_staff_only_by_default(self):
+        # Через локальный прокси все приходят с 127.0.0.1.
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(title='Толстой', slug='tolstoy',
+                                         description='Лев Толстой')
+        cls.in_group = Post.objects.create(text='В группе', author=cls.author,
+                                           group=cls.group)
+        cls.outside = Post.objects.create(text='Без группы',
+                                          author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def warm(self, url, client=None):
+        client = client or self.client
+        # Первый запрос заводит версии тегов, второй кладёт страницу.
+        client.get(url)
+        return client.get(url)
+
+    def is_cached(self, url, client=None):
+        client = client or self.client
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Остаются только поиски по уникальному индексу для валидаторов.
+        return len(context) <= 1 and not response.templates
+
+    def test_pages_are_served_from_cache(self):
+        for url in (reverse('index'),
+                    reverse('group', kwargs={'slug': 'tolstoy'}),
+                    reverse('post', kwargs={'username': 'Writer',
+                                            'post_id': self.in_group.id})):
+            response = self.warm(url)
+            self.assertTrue(self.is_cached(url), url)
+            cached = self.client.get(url)
+            self.assertEqual(cached.content, response.content)
+            self.assertIn('Cookie', cached['Vary'])
+
+    def test_writes_purge_only_affected_pages(self):
+        index = reverse('index')
+        group = reverse('group', kwargs={'slug': 'tolstoy'})
+        post = reverse('post', kwargs={'username': 'Writer',
+                                       'post_id': self.in_group.id})
+        for url in (index, group, post):
+            self.warm(url)
+
+        self.outside.text = 'Правка'
+        self.outside.save()
+        self.assertFalse(self.is_cached(index))
+        self.assertContains(self.client.get(index), 'Правка')
+        self.assertTrue(self.is_cached(group))
+        self.assertTrue(self.is_cached(post))
+
+        Comment.objects.create(post=self.in_group, author=self.author,
+                               text='Комментарий')
+        self.assertFalse(self.is_cached(post))
+        self.assertContains(self.client.get(post), 'Комментарий')
+
+        self.warm(group)
+        self.group.title = 'Лев Толстой'
+        self.group.save()
+        self.assertFalse(self.is_cached(group))
+
+    def test_new_post_purges_feed(self):
+        index = reverse('index')
+        self.warm(index)
+        Post.objects.create(text='Свежий', author=self.author)
+        self.assertContains(self.client.get(index), 'Свежий')
+
+    def test_logged_in_users_bypass_cache(self):
+        client = Client()
+        client.force_login(self.author)
+        url = reverse('index')
+        self.warm(url, client)
+        self.assertFalse(self.is_cached(url, client))
@@ -0,0 +1,174 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.pagination import (CachedCountPaginator, KeysetPaginator,
+                              decode_cursor)
+
+
+User = get_user_model()
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.client_guest = Client()
+        for i in range(25):
+            Post.objects.create(text=f'Пост {i}', author=cls.user)
+        # Часть постов с одинаковым временем — порядок решает id.
+        same_date = Post.objects.order_by('pub_date')[5].pub_date
+        Post.objects.filter(text__in=['Пост 10', 'Пост 11', 'Пост 12']
+                            ).update(pub_date=same_date)
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list('id',
+                                                                  flat=True))
+
+    def test_walk_forward_and_back(self):
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        page = paginator.get_page()
+        seen = [post.id for post in page]
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(after=page.next_cursor)
+            seen += [post.id for post in page]
+            pages.append(page)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[0].has_previous())
+
+        back = paginator.get_page(before=pages[2].previous_cursor)
+        self.assertEqual([post.id for post in back],
+                         [post.id for post in pages[1]])
+        first = paginator.get_page(before=back.previous_cursor)
+        self.assertEqual([post.id for post in first], self.expected[:10])
+        self.assertFalse(first.has_previous())
+
+    def test_no_count_query(self):
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        page = paginator.get_page()
+        with self.assertNumQueries(1):
+            page = paginator.get_page(after=page.next_cursor)
+            page.has_other_pages()
+
+    def test_bad_cursor_gives_first_page(self):
+        self.assertIsNone(decode_cursor('мусор'))
+        response = self.client_guest.get(reverse('index'),
+                                         {'after': 'not-a-cursor'})
+        self.assertEqual([post.id for post in response.context['page']],
+                         self.expected[:10])
+
+    def test_cursor_links_on_index(self):
+        response = self.client_guest.get(reverse('index'))
+        page = response.context['page']
+        self.assertContains(response, f'?after={page.next_cursor}')
+        response = self.client_guest.get(reverse('index'),
+                                         {'after': page.next_cursor})
+        self.assertEqual([post.id for post in response.context['page']],
+                         self.expected[10:20])
+
+    def test_legacy_page_links(self):
+        response = self.client_guest.get(reverse('profile', kwargs={
+            'username': self.user.username}), {'page': 2})
+        self.assertIsInstance(response.context['paginator'], Paginator)
+        self.assertEqual(response.context['page'].number, 2)
+        self.assertEqual([post.id for post in response.context['page']],
+                         self.expected[10:20])
+
+
+class CachedCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='StasBasov')
+        for i in range(25):
+            Post.objects.create(text=f'Пост {i}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('index'), params)
+        return response, [query['sql'] for query in context.captured_queries
+                          if 'COUNT(' in query['sql']]
+
+    def test_count_is_cached_and_invalidated(self):
+        response, counts = self.count_queries({'page': 1})
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(response.context['paginator'].num_pages, 3)
+        response, counts = self.count_queries({'page': 2})
+        self.assertEqual(counts, [])
+        Post.objects.create(text='Ещё', author=self.user)
+        for i in range(5):
+            Post.objects.create(text=f'Ещё {i}', author=self.user)
+        response, counts = self.count_queries({'page': 2})
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(response.context['paginator'].num_pages, 4)
+
+    def test_author_scope_uses_stored_counter(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse('profile', kwargs={'username': self.user}),
+                {'page': 1})
+        self.assertEqual(response.context['paginator'].count, 25)
+        self.assertFalse(any('COUNT(' in query['sql']
+                             for query in context.captured_queries))
+
+    @mock.patch('posts.pagination.ESTIMATE_THRESHOLD', 10)
+    def test_large_scope_uses_estimate(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        paginator = CachedCountPaginator(Post.objects.all(), 10, 'all')
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(paginator.count, 25)
+        self.assertFalse(any('COUNT(' in query['sql']
+                             for query in context.captured_queries))
+
+    @mock.patch('posts.pagination.ESTIMATE_THRESHOLD', 10)
+    def test_group_scope_counts_exactly(self):
+        small = Group.objects.create(title='Маленькая', slug='small',
+                                     description='Описание')
+        Post.objects.create(text='Один', author=self.user, group=small)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        paginator = CachedCountPaginator(small.posts.all(), 10,
+                                         f'group:{small.pk}')
+        self.assertEqual(paginator.count, 1)
+
+    def test_moving_post_recounts_both_groups(self):
+        old, new = (Group.objects.create(title=slug, slug=slug,
+                                         description='Описание')
+                    for slug in ('old', 'new'))
+        post = Post.objects.create(text='Переезд', author=self.user,
+                                   group=old)
+
+        def count(group):
+            return CachedCountPaginator(group.posts.all(), 10,
+                                        f'group:{group.pk}').count
+        self.assertEqual((count(old), count(new)), (1, 0))
+        post.group = new
+        post.save()
+        self.assertEqual((count(old), count(new)), (0, 1))
+
+    def test_page_window(self):
+        paginator = CachedCountPaginator(Post.objects.all(), 1, 'all')
+        self.assertEqual(paginator.page(1).page_window(),
+                         [1, 2, 3, None, 25])
+        self.assertEqual(paginator.page(12).page_window(),
+                         [1, None, 10, 11, 12, 13, 14, None, 25])
+        Post.objects.bulk_create(
+            Post(text=f'Пачка {i}', author=self.user) for i in range(60))
+        cache.clear()
+        response = self.client.get(reverse('index'), {'page': 1})
+        self.assertContains(response, '?page=9"')
+        self.assertNotContains(response, '?page=5"')
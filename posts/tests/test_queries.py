@@ -0,0 +1,124 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post, Group, Comment, Follow
+from posts.pagination import encode_cursor
+from posts.querylog import explain
+from posts.tests.utils import QueryBudgetMixin
+
+
+User = get_user_model()
+
+# Предел запросов на любую публичную страницу, сколько бы ни было данных.
+QUERY_BUDGET = 10
+
+
+class FeedDataMixin:
+    """Автор с постами в группе, комментарии и подписчик."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = cls.add_posts(1)[0]
+
+    @classmethod
+    def add_posts(cls, count):
+        posts = []
+        for i in range(count):
+            post = Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                       group=cls.group)
+            for j in range(3):
+                Comment.objects.create(post=post, author=cls.reader,
+                                       text=f'Комментарий {j}')
+            posts.append(post)
+        return posts
+
+    def pages(self):
+        return [
+            ('index', {}),
+            ('group', {'slug': self.group.slug}),
+            ('profile', {'username': self.author.username}),
+            ('post', {'username': self.author.username,
+                      'post_id': self.post.id}),
+            ('follow_index', {}),
+        ]
+
+
+class QueryBudgetTests(FeedDataMixin, QueryBudgetMixin, TestCase):
+
+    def count_queries(self, client, name, kwargs, params=None):
+        cache.clear()
+        with self.assertMaxQueries(QUERY_BUDGET, msg=name) as context:
+            response = client.get(reverse(name, kwargs=kwargs), params)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_budget_does_not_grow_with_data(self):
+        client = Client()
+        client.force_login(self.reader)
+        small = {name: self.count_queries(client, name, kwargs)
+                 for name, kwargs in self.pages()}
+        self.add_posts(25)
+        large = {name: self.count_queries(client, name, kwargs)
+                 for name, kwargs in self.pages()}
+        self.assertEqual(small, large)
+
+    def test_numbered_pages_within_budget(self):
+        self.add_posts(25)
+        client = Client()
+        client.force_login(self.reader)
+        for name, kwargs in self.pages():
+            self.count_queries(client, name, kwargs, {'page': 2})
+
+
+class QueryPlanTests(FeedDataMixin, TestCase):
+    """Запросы страниц идут по индексам.
+
+    И не сортируют строки во временном B-дереве.
+    """
+
+    def plans(self, client, name, kwargs, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse(name, kwargs=kwargs), params)
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            if query['sql'].startswith('SELECT'):
+                yield query['sql'], explain(connection, query['sql'], None)
+
+    def assertIndexedPlans(self, client, name, kwargs, params=None):
+        for sql, plan in self.plans(client, name, kwargs, params):
+            msg = f'{name}: {sql}\n{plan}'
+            self.assertNotIn('TEMP B-TREE', plan, msg)
+            for line in plan.splitlines():
+                if line.startswith('SCAN posts_'):
+                    self.assertIn(' USING ', line, msg)
+
+    def test_pages_use_indexes(self):
+        posts = self.add_posts(25)
+        client = Client()
+        client.force_login(self.reader)
+        cursor = encode_cursor(posts[15])
+        for name, kwargs in self.pages():
+            self.assertIndexedPlans(client, name, kwargs)
+            self.assertIndexedPlans(client, name, kwargs, {'after': cursor})
+            self.assertIndexedPlans(client, name, kwargs, {'before': cursor})
+            self.assertIndexedPlans(client, name, kwargs, {'page': 2})
+
+    def test_api_uses_indexes(self):
+        client = Client()
+        client.force_login(self.reader)
+        for name, kwargs in [
+            ('api:comments', {'post_id': self.post.id}),
+            ('api:group_posts', {'slug': self.group.slug}),
+            ('api:author_posts', {'username': self.author.username}),
+        ]:
+            self.assertIndexedPlans(client, name, kwargs)
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from posts import querylog
+from posts.models import Post, SlowQuery
+
+
+User = get_user_model()
+
+
+@override_settings(SLOW_QUERY_LOG=True, SLOW_QUERY_THRESHOLD=0)
+class SlowQueryLogTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Writer')
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        # Middleware загружается при первом запросе клиента.
+        self.client = Client()
+
+    def get_profile(self):
+        with self.assertLogs('posts.querylog', 'WARNING') as logs:
+            self.client.get(reverse('profile', kwargs={'username': 'Writer'}))
+        return logs
+
+    def test_records_slow_queries(self):
+        logs = self.get_profile()
+        self.assertIn('profile', logs.output[0])
+        self.assertTrue(SlowQuery.objects.exists())
+        self.assertFalse(
+            SlowQuery.objects.exclude(last_view='profile').exists())
+        query = SlowQuery.objects.get(sql__contains='"posts_post"."text"')
+        self.assertNotIn(str(self.user.pk), query.sql.replace('posts_', ''))
+        self.assertNotIn("'Writer'", query.sql)
+        self.assertTrue(query.plan)
+
+        self.get_profile()
+        query.refresh_from_db()
+        self.assertGreater(query.calls, 1)
+        self.assertGreaterEqual(query.total_time, query.max_time)
+
+    @override_settings(SLOW_QUERY_TOP=2)
+    def test_admin_shows_only_top_queries(self):
+        self.get_profile()
+        self.assertGreater(SlowQuery.objects.count(), 2)
+        self.assertEqual(querylog.top_queries().count(), 2)
+
+    @override_settings(SLOW_QUERY_TOP=2, SLOW_QUERY_KEEP=2)
+    def test_frequent_query_builds_up(self):
+        querylog.store('SELECT ?', (), 'one', '', 10)
+        querylog.store('SELECT ? + ?', (), 'two', '', 10)
+        # Новый дешёвый запрос вытесняет давний, а не сам себя.
+        for _ in range(30):
+            querylog.store('SELECT * FROM posts_follow', (), 'follow', '', 1)
+        self.assertEqual(
+            list(SlowQuery.objects.order_by('last_seen').values_list(
+                'last_view', flat=True)), ['two', 'follow'])
+        self.assertEqual(querylog.top_queries().first().last_view, 'follow')
+
+    @override_settings(SLOW_QUERY_LOG=False)
+    def test_disabled(self):
+        self.client.get(reverse('profile', kwargs={'username': 'Writer'}))
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_normalize(self):
+        self.assertEqual(
+            querylog.normalize(
+                "SELECT * FROM t WHERE a = 'x''y' AND b IN (%s, %s)\n"
+                "  AND c > 1.5 LIMIT 20"),
+            'SELECT * FROM t WHERE a = ? AND b IN (...) AND c > ? LIMIT ?')
+
+    def test_admin(self):
+        self.get_profile()
+        admin = User.objects.create_superuser('admin', 'a@example.com', 'pw')
+        client = Client()
+        client.force_login(admin)
+        with self.assertLogs('posts.querylog', 'WARNING'):
+            response = client.get('/admin/posts/slowquery/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'posts_post')
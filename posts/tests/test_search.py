@@ -0,0 +1,81 @@
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from posts.models import Post, Group
+from posts.search import build_match
+
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.other = User.objects.create_user(username='Anna')
+        cls.group = Group.objects.create(title='Толстой', slug='tolstoy',
+                                         description='Лев Толстой')
+        cls.best = Post.objects.create(
+            text='Война и мир. Война, война и снова война.', author=cls.user)
+        cls.good = Post.objects.create(
+            text='Роман о войне: война и мир', author=cls.other,
+            group=cls.group)
+        Post.objects.create(text='Анна Каренина', author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, **params):
+        response = self.client.get(reverse('search'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, [post.id for post in response.context['page']]
+
+    def test_ranked_results(self):
+        _, ids = self.search(q='война')
+        self.assertEqual(ids, [self.best.id, self.good.id])
+
+    def test_filters(self):
+        _, ids = self.search(q='война', group='tolstoy')
+        self.assertEqual(ids, [self.good.id])
+        _, ids = self.search(q='война', author='StasBasov')
+        self.assertEqual(ids, [self.best.id])
+        _, ids = self.search(q='война', author='nobody')
+        self.assertEqual(ids, [])
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(text='Воскресение', author=self.user)
+        _, ids = self.search(q='воскресение')
+        self.assertEqual(ids, [post.id])
+        Post.objects.filter(pk=post.pk).update(text='Хаджи-Мурат')
+        _, ids = self.search(q='воскресение')
+        self.assertEqual(ids, [])
+        post.delete()
+        _, ids = self.search(q='мурат')
+        self.assertEqual(ids, [])
+
+    def test_cursor_pagination_keeps_query(self):
+        for i in range(15):
+            Post.objects.create(text=f'Детство {i}', author=self.user)
+        response, first = self.search(q='детство')
+        page = response.context['page']
+        self.assertContains(response,
+                            urlencode({'q': 'детство'}) + '&amp;after=')
+        _, second = self.search(q='детство', after=page.next_cursor)
+        self.assertEqual(len(first) + len(second), 15)
+        self.assertFalse(set(first) & set(second))
+
+    def test_user_input_is_not_fts_syntax(self):
+        self.assertEqual(build_match('мир OR "война'), '"мир" "OR" "война"*')
+        self.assertIsNone(build_match('  ()*" '))
+        _, ids = self.search(q='мир NEAR(')
+        self.assertEqual(ids, [])
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/posts/post/', {'q': 'каренина'})
+        self.assertEqual(response.context['cl'].result_count, 1)
@@ -0,0 +1,135 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post
+from posts.tests.utils import uploaded_image
+
+
+User = get_user_model()
+
+LARGEST = (960, 'JPEG')
+
+
+class ThumbnailTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='StasBasov')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, name='image.png'):
+        return uploaded_image(name)
+
+    def create_post(self):
+        return Post.objects.create(text='Картинка', author=self.user,
+                                   image=self.upload())
+
+    @mock.patch('posts.forms.thumbnails.generate_later')
+    def test_form_schedules_generation(self, generate_later):
+        self.client.post(reverse('new_post'),
+                         {'text': 'С картинкой', 'image': self.upload()})
+        post = Post.objects.get()
+        self.assertTrue(post.image)
+        generate_later.assert_called_once_with(post)
+
+        generate_later.reset_mock()
+        self.client.post(reverse('post_edit', kwargs={
+            'username': self.user, 'post_id': post.id}), {'text': 'Правка'})
+        generate_later.assert_not_called()
+
+    def test_card_falls_back_to_original(self):
+        post = self.create_post()
+        self.assertIsNone(thumbnails.lookup(post.image, LARGEST))
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, f'src="{post.image.url}"')
+
+    def test_render_is_lookup(self):
+        post = self.create_post()
+        thumbnails.generate_for_post(post.id)
+        thumbnail = thumbnails.lookup(post.image, LARGEST)
+        self.assertIsNotNone(thumbnail)
+        with mock.patch('sorl.thumbnail.default.backend.get_thumbnail') \
+                as get_thumbnail:
+            response = self.client.get(reverse('index'))
+        get_thumbnail.assert_not_called()
+        self.assertContains(response, f'src="{thumbnail.url}"')
+
+    def test_card_has_responsive_variants(self):
+        post = self.create_post()
+        thumbnails.generate_for_post(post.id)
+        post.refresh_from_db()
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,'))
+        webp = thumbnails.lookup(post.image, (320, 'WEBP'))
+        self.assertTrue(webp.name.endswith('.webp'))
+        self.assertEqual((webp.width, webp.height), (320, 113))
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, f'{webp.url} 320w')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, post.image_placeholder)
+
+    def test_new_image_resets_placeholder(self):
+        post = self.create_post()
+        Post.objects.filter(pk=post.pk).update(image_placeholder='data:old')
+        with mock.patch('posts.forms.thumbnails.generate_later'):
+            self.client.post(reverse('post_edit', kwargs={
+                'username': self.user, 'post_id': post.id}),
+                {'text': 'Новая картинка', 'image': self.upload('new.png')})
+        post.refresh_from_db()
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_backfill_command(self):
+        posts = [self.create_post() for _ in range(3)]
+        Post.objects.create(text='Без картинки', author=self.user)
+        out = StringIO()
+        call_command('generate_thumbnails', '--workers', '1',
+                     '--batch-size', '2', stdout=out)
+        self.assertIn('Обработано постов: 3', out.getvalue())
+        for post in posts:
+            self.assertIsNotNone(thumbnails.lookup(post.image, LARGEST))
+
+    def kvstore_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in context.captured_queries
+                          if 'thumbnail_kvstore' in query['sql']]
+
+    # В тестах очередь выполняет задачи сразу: промах не должен генерировать.
+    @mock.patch('posts.templatetags.post_tags.thumbnails.generate_later')
+    def test_page_resolves_thumbnails_in_one_batch(self, generate_later):
+        posts = [self.create_post() for _ in range(5)]
+        thumbnails.generate_for_post(posts[0].id)
+        thumbnail = thumbnails.lookup(posts[0].image, LARGEST)
+        cache.clear()
+        url = reverse('profile', kwargs={'username': self.user})
+        response, queries = self.kvstore_queries(url)
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, f'src="{thumbnail.url}"')
+        self.assertContains(response, f'src="{posts[1].image.url}"')
+        # Карточки уже в кэше — к хранилищу превью не обращаемся вовсе.
+        with mock.patch('posts.thumbnails._get_many_raw') as get_many:
+            response, queries = self.kvstore_queries(url)
+        self.assertEqual(queries, [])
+        get_many.assert_not_called()
+
+    def test_single_post_uses_per_image_lookup(self):
+        post = self.create_post()
+        thumbnails.generate_for_post(post.id)
+        thumbnail = thumbnails.lookup(post.image, LARGEST)
+        response = self.client.get(reverse('post', kwargs={
+            'username': self.user, 'post_id': post.id}))
+        self.assertContains(response, f'src="{thumbnail.url}"')
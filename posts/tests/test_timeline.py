@@ -0,0 +1,65 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post, Follow, TimelineEntry
+
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.other = User.objects.create_user(username='Other')
+        cls.old_post = Post.objects.create(text='Старый пост',
+                                           author=cls.author)
+        Post.objects.create(text='Чужой пост', author=cls.other)
+
+    def setUp(self):
+        self.client_reader = Client()
+        self.client_reader.force_login(self.reader)
+
+    def feed_ids(self):
+        response = self.client_reader.get(reverse('follow_index'))
+        return [post.id for post in response.context['page']]
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        self.client_reader.get(reverse('profile_follow', kwargs={
+            'username': self.author.username}))
+        self.assertEqual(self.feed_ids(), [self.old_post.id])
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.feed_ids(), [new_post.id, self.old_post.id])
+
+    def test_unfollow_removes_posts(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other)
+        self.client_reader.get(reverse('profile_unfollow', kwargs={
+            'username': self.author.username}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader, author=self.author).exists())
+        self.assertEqual(len(self.feed_ids()), 1)
+
+    def test_rebuild_command(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.feed_ids(), [self.old_post.id])
+
+    def test_feed_does_not_join_follow(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            self.feed_ids()
+        feed_sql = [query['sql'] for query in queries.captured_queries
+                    if 'posts_timelineentry' in query['sql']]
+        self.assertEqual(len(feed_sql), 1)
+        self.assertNotIn('posts_follow', feed_sql[0])
@@ -4,7 +4,6 @@ from django.urls import reverse
 from django.http import HttpResponseRedirect
 from django.shortcuts import redirect
 from django.core.cache import cache
-from django.core.cache.utils import make_template_fragment_key
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 from posts.models import Post, Group, Comment, Follow
@@ -27,7 +26,6 @@ class StaticURLTests(TestCase):
                                               description='Лев Толстой'
                                               )
         cls.test_post = Post.objects.create(text='Текст', author=cls.user)
-        cls.key = make_template_fragment_key('index_page')
 
     def setUp(self):
         self.authorized_client.force_login(self.user)
@@ -142,17 +140,26 @@ class StaticURLTests(TestCase):
         self.assertContains(response_profile, '<img')
         self.assertContains(response_post, '<img')
 
-    def test_cache_after_time(self):
+    def test_index_cache_is_versioned(self):
         response_old = self.authorized_client.get(reverse('index'))
+        # Изменение в обход сигналов не сбрасывает кэш ленты.
+        Post.objects.filter(pk=self.test_post.pk).update(text='Скрытая правка')
+        response_cached = self.authorized_client.get(reverse('index'))
+        self.assertEqual(response_old.content, response_cached.content)
         self.authorized_client.post(
                                     reverse('new_post'),
                                     {'text': 'Новое сообщение!!!'},
                                     follow=True)
         response_new = self.authorized_client.get(reverse('index'))
-        self.assertEqual(response_old.content, response_new.content)
-        cache.touch(self.key, 0)
-        response_newest = self.authorized_client.get(reverse('index'))
-        self.assertNotEqual(response_old.content, response_newest.content)
+        self.assertContains(response_new, 'Новое сообщение!!!')
+
+    def test_cache_is_page_aware(self):
+        for i in range(12):
+            Post.objects.create(text=f'Пост номер {i}', author=self.user)
+        response_first = self.client.get(reverse('index'))
+        response_second = self.client.get(reverse('index'), {'page': 2})
+        self.assertContains(response_first, 'Пост номер 11')
+        self.assertNotContains(response_second, 'Пост номер 11')
 
     def test_follow(self):
         follow_count = Follow.objects.count()
@@ -249,3 +256,55 @@ class StaticURLTests(TestCase):
                                     },
                                 follow=True)
         self.assertNotEquals(Comment.objects.count(), comment_count + 1)
+
+
+class PostCardCacheTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(text='Карточка', author=cls.author)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.profile_url = reverse('profile',
+                                   kwargs={'username': self.author})
+        self.edit_url = reverse('post_edit', kwargs={
+            'username': self.author, 'post_id': self.post.id})
+
+    def test_edit_link_only_for_author(self):
+        self.assertContains(self.author_client.get(self.profile_url),
+                            self.edit_url)
+        self.assertNotContains(self.reader_client.get(self.profile_url),
+                               self.edit_url)
+        self.assertContains(self.author_client.get(self.profile_url),
+                            self.edit_url)
+
+    def test_card_rendered_once(self):
+        self.reader_client.get(self.profile_url)
+        Post.objects.filter(pk=self.post.pk).update(text='Скрыто')
+        self.assertContains(self.reader_client.get(self.profile_url),
+                            'Карточка')
+
+    def test_comment_invalidates_card(self):
+        self.reader_client.get(self.profile_url)
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Первый')
+        self.assertContains(self.reader_client.get(self.profile_url),
+                            'Комментариев: 1')
+
+    def test_deleted_group_link_leaves_card(self):
+        group = Group.objects.create(title='Удаляемая', slug='gone',
+                                     description='Описание')
+        Post.objects.create(text='В группе', author=self.author,
+                            group=group)
+        self.assertContains(self.reader_client.get(self.profile_url),
+                            '/group/gone')
+        group.delete()
+        self.assertNotContains(self.reader_client.get(self.profile_url),
+                               '/group/gone')
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from io import BytesIO
+from itertools import count
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+_colors = count(1)
+
+
+def uploaded_image(name='image.png', color=None):
+    """PNG-загрузка; без color каждый вызов даёт новое содержимое."""
+    if color is None:
+        color = next(_colors) % 256
+    buffer = BytesIO()
+    Image.new('RGB', (40, 20), (color, 0, 0)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/png')
+
+
+class QueryBudgetMixin:
+    """Проверка, что блок кода укладывается в заданное число запросов."""
+
+    @contextmanager
+    def assertMaxQueries(self, budget, msg=None):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context)
+        if executed > budget:
+            queries = "\n".join(
+                f"{number}. {query['sql']}" for number, query in
+                enumerate(context.captured_queries, start=1))
+            self.fail(self._formatMessage(
+                msg,
+                f"{executed} queries executed, budget is {budget}:\n"
+                f"{queries}"))
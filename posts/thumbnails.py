@@ -0,0 +1,217 @@
+import base64
+from io import BytesIO
+
+from django.core.cache import cache
+from django.utils import timezone
+from PIL import Image, ImageFilter, ImageOps
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+from yatube import metrics
+
+from . import caching
+from .jobs import enqueue, task
+from .models import Post
+
+# Карточка поста: ширины для srcset, каждая в WebP и в JPEG.
+CARD_WIDTHS = (320, 640, 960)
+CARD_HEIGHT_RATIO = 339 / 960
+CARD_FORMATS = ("WEBP", "JPEG")
+# Подсказка браузеру, какой ширины будет картинка в вёрстке.
+CARD_SIZES = "(min-width: 992px) 960px, 100vw"
+# Превью: (ширина, формат) -> геометрия и параметры sorl-thumbnail.
+SIZES = {
+    (width, format_): (f"{width}x{round(width * CARD_HEIGHT_RATIO)}",
+                       {"crop": "center", "upscale": True,
+                        "format": format_})
+    for width in CARD_WIDTHS for format_ in CARD_FORMATS
+}
+# Размытая заглушка, встраиваемая в страницу до загрузки картинки.
+PLACEHOLDER_SIZE = (24, 8)
+PLACEHOLDER_QUALITY = 40
+# Пока задача в очереди, повторные промахи её не дублируют.
+PENDING_TIMEOUT = 300
+
+
+def _options(variant):
+    """Параметры так же, как их дополняет ThumbnailBackend.get_thumbnail."""
+    backend = default.backend
+    options = dict(SIZES[variant][1])
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, variant):
+    """ImageFile будущего превью; вычисляется без обращения к диску."""
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(source, SIZES[variant][0],
+                                                   _options(variant))
+    return ImageFile(name, default.storage)
+
+
+def lookup(image, variant):
+    """Готовое превью из хранилища sorl-thumbnail или None."""
+    if not image:
+        return None
+    return default.kvstore.get(thumbnail_file(image, variant))
+
+
+def _get_many_raw(keys):
+    """Пачечный CachedDBKVStore._get_raw: один get_many и один SELECT."""
+    kvstore = default.kvstore
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(key__in=missing)
+                     .values_list("key", "value"))
+        # Промахи кэшируем так же, как sorl, чтобы не ходить в БД снова.
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {key: value for key, value in values.items()
+            if value and value != EMPTY_VALUE}
+
+
+def lookup_many(images):
+    """Готовые превью всех размеров SIZES: {(имя картинки, вариант): файл}.
+
+    Для хранилища по умолчанию (cached_db) это один get_many к кэшу и
+    не больше одного запроса к БД; для прочих — поштучные lookup.
+    """
+    wanted = {(image.name, variant): thumbnail_file(image, variant)
+              for image in images if image for variant in SIZES}
+    if not wanted:
+        return {}
+    if not isinstance(default.kvstore, CachedDBKVStore):
+        return {key: default.kvstore.get(file)
+                for key, file in wanted.items()}
+    raw_keys = {key: add_prefix(file.key) for key, file in wanted.items()}
+    values = _get_many_raw(list(raw_keys.values()))
+    return {key: (deserialize_image_file(values[raw_key])
+                  if raw_key in values else None)
+            for key, raw_key in raw_keys.items()}
+
+
+def preload(posts):
+    """Разложить превью страницы по постам; шаблонный тег читает их оттуда."""
+    posts = [post for post in posts if post.image]
+    found = lookup_many(post.image for post in posts)
+    for post in posts:
+        post.preloaded_thumbnails = {
+            variant: found[post.image.name, variant] for variant in SIZES}
+
+
+class CardImage:
+    """Набор превью карточки для <picture>: srcset в WebP и в JPEG."""
+
+    sizes = CARD_SIZES
+
+    def __init__(self, files):
+        self.files = files
+
+    def srcset(self, format_):
+        return ", ".join(f"{self.files[width, format_].url} {width}w"
+                         for width in CARD_WIDTHS)
+
+    @property
+    def webp_srcset(self):
+        return self.srcset("WEBP")
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset("JPEG")
+
+    @property
+    def src(self):
+        return self.files[CARD_WIDTHS[-1], "JPEG"].url
+
+    @property
+    def width(self):
+        return self.files[CARD_WIDTHS[-1], "JPEG"].width
+
+    @property
+    def height(self):
+        return self.files[CARD_WIDTHS[-1], "JPEG"].height
+
+
+def card_image(image, preloaded=None):
+    """CardImage, если готовы все превью, иначе None."""
+    if not image:
+        return None
+    preloaded = preloaded or {}
+    files = {}
+    for variant in SIZES:
+        files[variant] = (preloaded[variant] if variant in preloaded
+                          else lookup(image, variant))
+        if files[variant] is None:
+            return None
+    return CardImage(files)
+
+
+def placeholder(image):
+    """Крошечная размытая копия картинки в виде data URI."""
+    image.open()
+    image.seek(0)
+    with Image.open(image) as source:
+        # JPEG можно декодировать сразу в уменьшенном масштабе.
+        source.draft("RGB", (PLACEHOLDER_SIZE[0] * 8, PLACEHOLDER_SIZE[1] * 8))
+        preview = ImageOps.fit(source.convert("RGB"), PLACEHOLDER_SIZE)
+    preview = preview.filter(ImageFilter.GaussianBlur(1))
+    buffer = BytesIO()
+    preview.save(buffer, "JPEG", quality=PLACEHOLDER_QUALITY)
+    data = base64.b64encode(buffer.getvalue()).decode("ascii")
+    return f"data:image/jpeg;base64,{data}"
+
+
+def generate(image):
+    """Все превью картинки и её заглушка."""
+    with metrics.timer("thumbnail"):
+        for geometry, options in SIZES.values():
+            get_thumbnail(image, geometry, **options)
+        return placeholder(image)
+
+
+def save_generated(post_id, image_placeholder):
+    """Сохранить заглушку и сдвинуть modified — карточка перерисуется."""
+    Post.objects.filter(pk=post_id).update(
+        image_placeholder=image_placeholder, modified=timezone.now())
+
+
+def pending_key(post_id):
+    return f"thumbnails:pending:{post_id}"
+
+
+@task
+def generate_for_post(post_id):
+    """Все превью поста и сброс его карточки."""
+    try:
+        post = Post.objects.filter(pk=post_id).only(
+            "image", "author_id", "group_id").first()
+        if post is None or not post.image:
+            return
+        save_generated(post_id, generate(post.image))
+        caching.bump_feed_version()
+        caching.bump_scopes(*caching.post_scopes(post_id, post.author_id,
+                                                 post.group_id))
+    finally:
+        cache.delete(pending_key(post_id))
+
+
+def generate_later(post):
+    """Поставить генерацию превью в очередь задач."""
+    # Промахи при показе не должны писать в очередь на каждый запрос.
+    if not cache.add(pending_key(post.pk), 1, PENDING_TIMEOUT):
+        return
+    enqueue(generate_for_post,
+            key=f"thumbnails:{post.pk}:{post.modified.timestamp()}",
+            post_id=post.pk)
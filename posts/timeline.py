@@ -0,0 +1,92 @@
+from django.db import transaction
+
+from .caching import bump_scopes
+from .models import Follow, Post, TimelineEntry
+from .pagination import CachedCountPaginator, KeysetPaginator
+
+# Сколько последних постов автора попадает в ленту при подписке.
+BACKFILL_SIZE = 100
+BATCH_SIZE = 500
+# Новые посты не сбрасывают счётчик ленты, поэтому храним его недолго.
+COUNT_TIMEOUT = 60
+
+
+def _entries(user_ids, posts):
+    return [
+        TimelineEntry(user_id=user_id,
+                      post_id=post.id,
+                      author_id=post.author_id,
+                      pub_date=post.pub_date)
+        for user_id in user_ids
+        for post in posts
+    ]
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам всех подписчиков автора."""
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id).values_list("user_id", flat=True))
+    TimelineEntry.objects.bulk_create(_entries(followers, [post]),
+                                      batch_size=BATCH_SIZE,
+                                      ignore_conflicts=True)
+    if followers:
+        bump_scopes(*(f"follow:{user_id}" for user_id in followers))
+
+
+def backfill(user_id, author_id, limit=BACKFILL_SIZE):
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        "-pub_date", "-id").only("id", "author_id", "pub_date")[:limit]
+    TimelineEntry.objects.bulk_create(_entries([user_id], posts),
+                                      batch_size=BATCH_SIZE,
+                                      ignore_conflicts=True)
+    bump_scopes(f"follow:{user_id}")
+
+
+def remove(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+    bump_scopes(f"follow:{user_id}")
+
+
+def rebuild(user_ids=None, limit=BACKFILL_SIZE):
+    """Пересобирает ленты с нуля; возвращает число подписок."""
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+    count = 0
+    with transaction.atomic():
+        entries.delete()
+        for user_id, author_id in follows.values_list(
+                "user_id", "author_id").iterator():
+            backfill(user_id, author_id, limit)
+            count += 1
+    return count
+
+
+def timeline_scope(user_id):
+    return f"timeline:{user_id}"
+
+
+def timeline_for(user):
+    return TimelineEntry.objects.filter(user=user).select_related(
+        "post__author", "post__group")
+
+
+class TimelinePostsMixin:
+    """Страница ленты содержит сами посты, а не записи TimelineEntry."""
+
+    def _get_page(self, entries, *args, **kwargs):
+        posts = [entry.post for entry in entries]
+        return super()._get_page(posts, *args, **kwargs)
+
+
+class TimelinePaginator(TimelinePostsMixin, KeysetPaginator):
+    ordering = ("-pub_date", "-post_id")
+
+
+class NumberedTimelinePaginator(TimelinePostsMixin, CachedCountPaginator):
+
+    def __init__(self, object_list, per_page, scope):
+        super().__init__(object_list, per_page, scope, COUNT_TIMEOUT)
@@ -1,33 +1,54 @@
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
 from django.shortcuts import redirect
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
 
 
 from .models import Post, Group, User, Comment, Follow
-from .forms import PostForm, CommentForm
+from .forms import PostForm, CommentForm, SearchForm
+from .counters import stats_for
+from .caching import (FEED_TIMEOUT, feed_version, page_cache_key,
+                      scope_versions)
+from .pagination import PAGE_SIZE, paginate, page_query
+from .search import SearchPaginator, build_match
+from .follow_feed import paginate_follow_feed
+from .exporter import FORMATS, export_stream
+from .page_cache import anonymous_cache, post_tags, tag_page
+from .conditional import (conditional, follow_scopes, group_scopes,
+                          index_scopes, post_scopes, profile_scopes)
 
 
+@conditional(index_scopes)
+@anonymous_cache
 def index(request):
-    post_list = Post.objects.order_by("-pub_date").all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    paginator, page = paginate(request, post_list, "all")
+    tag_page(request, "list:all", *post_tags(page))
     return render(
          request,
          "index.html",
-         {"page": page, "paginator": paginator}
+         {
+             "page": page,
+             "paginator": paginator,
+             "feed_version": feed_version(),
+             "page_key": page_cache_key(request),
+             "feed_timeout": FEED_TIMEOUT,
+         }
      )
 
 
+@conditional(group_scopes)
+@anonymous_cache
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = group.posts.for_feed()
+    paginator, page = paginate(request, post_list, f"group:{group.pk}")
+    tag_page(request, f"group:{group.pk}", f"list:group:{group.pk}",
+             *post_tags(page))
     return render(
          request,
          "group.html",
@@ -37,12 +58,13 @@ def group_posts(request, slug):
 
 @login_required
 def new_post(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == "POST":
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            form.save()
+            with transaction.atomic():
+                form.save()
             return redirect("index")
     return render(request, "new_post.html", {
                                             "form": form,
@@ -50,29 +72,38 @@ def new_post(request):
                                             })
 
 
+@conditional(profile_scopes)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = author.posts.for_feed()
+    paginator, page = paginate(request, post_list, f"author:{author.pk}")
     is_follow = author.following.filter(user=request.user.id).exists()
     return render(
         request,
         "profile.html",
         {
             "author": author,
+            "stats": stats_for(author),
             "user": request.user,
             "page": page,
             "paginator": paginator,
-            "following": is_follow
+            "following": is_follow,
+            "profile_version": scope_versions([f"author:{author.pk}"])[0],
+            "page_key": page_cache_key(request),
+            "feed_timeout": FEED_TIMEOUT,
         }
     )
 
 
+@conditional(post_scopes)
+@anonymous_cache
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.for_feed(),
+                             author__username=username,
+                             id=post_id)
+    tag_page(request, f"post:{post.pk}", f"stats:{post.author_id}")
+    comments = post.comments.select_related("author").order_by(
+        "created", "id")
     form = CommentForm(request.POST or None)
 
     return render(
@@ -80,6 +111,7 @@ def post_view(request, username, post_id):
         "post.html",
         {
             "author": post.author,
+            "stats": stats_for(post.author),
             "post": post,
             "comments": comments,
             "form": form
@@ -94,9 +126,7 @@ def post_edit(request, username, post_id):
                     instance=post)
     if request.method == "POST":
         if form.is_valid():
-            post.text = form.cleaned_data["text"]
-            post.group = form.cleaned_data["group"]
-            post.save()
+            form.save()
             return redirect(
                 "post",
                 username=username,
@@ -115,14 +145,17 @@ def post_edit(request, username, post_id):
 
 @login_required
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, id=post_id)
+    post = get_object_or_404(Post.objects.for_feed(),
+                             author__username=username,
+                             id=post_id)
     form = CommentForm(request.POST or None)
     if request.method == "POST":
         if form.is_valid():
             comment = form.save(commit=False)
             comment.post = post
             comment.author = request.user
-            comment.save()
+            with transaction.atomic():
+                comment.save()
             return redirect(
                 "post",
                 username=username,
@@ -133,6 +166,8 @@ def add_comment(request, username, post_id):
         "post.html",
         {
             "form": form,
+            "author": post.author,
+            "stats": stats_for(post.author),
             "post": post
         }
     )
@@ -152,11 +187,9 @@ def server_error(request):
 
 
 @login_required
+@conditional(follow_scopes)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    paginator, page = paginate_follow_feed(request)
     return render(
         request,
         "follow.html",
@@ -171,12 +204,65 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect("profile", username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user, author=author).delete()
     return redirect("profile", username=username)
+
+
+@login_required
+def export(request):
+    """Выгрузка своих данных; ?scope=all — всего сайта (для staff)."""
+    format_ = request.GET.get("format", "jsonl")
+    if format_ not in FORMATS:
+        return HttpResponseBadRequest("Неизвестный формат")
+    everything = request.GET.get("scope") == "all"
+    if everything and not request.user.is_staff:
+        raise PermissionDenied
+    gzip = "gzip" in request.GET
+    filename = "yatube" if everything else request.user.username
+    filename = f"{filename}.{format_}" + (".gz" if gzip else "")
+    content_type = "application/gzip" if gzip else (
+        "text/csv" if format_ == "csv" else "application/x-ndjson")
+    response = StreamingHttpResponse(
+        export_stream(None if everything else request.user, format_, gzip),
+        content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def search(request):
+    form = SearchForm(request.GET or None)
+    paginator = page = None
+    match = form.is_valid() and build_match(form.cleaned_data["q"])
+    if match:
+        group = form.cleaned_data["group"]
+        username = form.cleaned_data["author"]
+        author = User.objects.filter(username=username).first() \
+            if username else None
+        if username and author is None:
+            page = []
+        else:
+            paginator = SearchPaginator(
+                match, PAGE_SIZE,
+                group_id=group.pk if group else None,
+                author_id=author.pk if author else None)
+            page = paginator.get_page(after=request.GET.get("after"),
+                                      before=request.GET.get("before"))
+    return render(
+        request,
+        "search.html",
+        {
+            "form": form,
+            "page": page,
+            "paginator": paginator,
+            "page_query": page_query(request),
+        }
+    )
@@ -0,0 +1,321 @@
+"""Общий для процессов одного хоста кэш без внешних сервисов.
+
+Записи лежат в файле SQLite в режиме WAL; перед ним в каждом процессе
+стоит небольшой LRU с коротким сроком жизни. Каждая запись и удаление
+добавляет ключ в журнал инвалидаций. Чужие коммиты процесс замечает по
+PRAGMA data_version (счётчик, который SQLite меняет при коммите другого
+соединения) и выбрасывает из LRU перечисленные в журнале ключи.
+
+    CACHES = {
+        "default": {
+            "BACKEND": "yatube.cache.SQLiteCache",
+            "LOCATION": "/var/cache/yatube/cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 100000, "LOCAL_TIMEOUT": 2},
+        }
+    }
+
+LOCATION ":memory:" — кэш в памяти, свой у каждого потока (для тестов).
+"""
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL
+);
+CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires);
+CREATE TABLE IF NOT EXISTS cache_invalidation (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+# Сколько ждать блокировку записи другого процесса, секунд.
+BUSY_TIMEOUT = 5
+# Чистка просроченных записей и журнала — в среднем раз на столько записей.
+CULL_EVERY = 200
+# В журнале инвалидаций ключ нужен, пока его копия может жить в LRU.
+INVALIDATION_TTL = 60
+# Ключ в журнале, означающий clear().
+CLEAR_ALL = "*"
+# В LRU запоминаются и промахи.
+MISSING = object()
+# Параметры SQL-запроса ограничены SQLITE_MAX_VARIABLE_NUMBER.
+CHUNK_SIZE = 500
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.path = location
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 2)
+        self.local_max_entries = options.get("LOCAL_MAX_ENTRIES", 1000)
+        self._state = threading.local()
+        self._lock = threading.Lock()
+        self._reset_local()
+
+    def _reset_local(self):
+        self._pid = os.getpid()
+        self._local = OrderedDict()
+        self._seq = None
+
+    def _connection(self):
+        state = self._state
+        if getattr(state, "pid", None) != os.getpid():
+            # После fork соединение и LRU родителя не годятся.
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset_local()
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT,
+                                         isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            state.connection = connection
+            state.pid = os.getpid()
+            state.data_version = None
+        return state.connection
+
+    @contextmanager
+    def _transaction(self, connection):
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    # LRU процесса.
+
+    def _sync(self, connection):
+        """Выбросить из LRU ключи, которые изменили другие соединения."""
+        state = self._state
+        data_version = connection.execute(
+            "PRAGMA data_version").fetchone()[0]
+        if data_version == state.data_version:
+            return
+        state.data_version = data_version
+        with self._lock:
+            if self._seq is None:
+                row = connection.execute(
+                    "SELECT MAX(seq) FROM cache_invalidation").fetchone()
+                self._seq = row[0] or 0
+                return
+            rows = connection.execute(
+                "SELECT seq, key FROM cache_invalidation WHERE seq > ?",
+                (self._seq,)).fetchall()
+            for seq, key in rows:
+                if key == CLEAR_ALL:
+                    self._local.clear()
+                else:
+                    self._local.pop(key, None)
+                self._seq = max(self._seq, seq)
+
+    def _recall(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            blob, expires = entry
+            if expires <= time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return blob
+
+    def _remember(self, key, blob, expires):
+        local_expires = time.time() + self.local_timeout
+        if expires is not None:
+            local_expires = min(local_expires, expires)
+        with self._lock:
+            self._local[key] = (blob, local_expires)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _forget(self, keys):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    # Общее хранилище.
+
+    def _log(self, connection, keys):
+        now = time.time()
+        connection.executemany(
+            "INSERT INTO cache_invalidation (key, created) VALUES (?, ?)",
+            [(key, now) for key in keys])
+
+    def _write(self, connection, rows):
+        connection.executemany(
+            "INSERT OR REPLACE INTO cache_entry (key, value, expires) "
+            "VALUES (?, ?, ?)", rows)
+        self._log(connection, [key for key, _, _ in rows])
+
+    def _cull(self, connection):
+        if random.randrange(CULL_EVERY):
+            return
+        now = time.time()
+        with self._transaction(connection):
+            connection.execute("DELETE FROM cache_entry WHERE expires < ?",
+                               (now,))
+            connection.execute(
+                "DELETE FROM cache_invalidation WHERE created < ?",
+                (now - max(INVALIDATION_TTL, self.local_timeout * 10),))
+            count = connection.execute(
+                "SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+            if count > self._max_entries:
+                connection.execute(
+                    "DELETE FROM cache_entry WHERE key IN ("
+                    "SELECT key FROM cache_entry "
+                    "ORDER BY expires IS NULL, expires LIMIT ?)",
+                    (count // self._cull_frequency,))
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _load(self, connection, keys):
+        """{key: (blob, expires)} для живых записей."""
+        now = time.time()
+        found = {}
+        for start in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[start:start + CHUNK_SIZE]
+            rows = connection.execute(
+                "SELECT key, value, expires FROM cache_entry "
+                f"WHERE key IN ({', '.join('?' * len(chunk))})", chunk)
+            for key, blob, expires in rows:
+                if expires is None or expires > now:
+                    found[key] = (blob, expires)
+        return found
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        connection = self._connection()
+        self._sync(connection)
+        blobs = {}
+        missing = []
+        for key in keys:
+            blob = self._recall(key)
+            if blob is None:
+                missing.append(key)
+            elif blob is not MISSING:
+                blobs[key] = blob
+        if missing:
+            loaded = self._load(connection, missing)
+            for key in missing:
+                blob, expires = loaded.get(key, (MISSING, None))
+                self._remember(key, blob, expires)
+                if blob is not MISSING:
+                    blobs[key] = blob
+        metrics.count_cache(len(blobs), len(keys) - len(blobs))
+        return {key: pickle.loads(blob) for key, blob in blobs.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self._key(key, version), self._dumps(value), expires)
+                for key, value in data.items()]
+        connection = self._connection()
+        with self._transaction(connection):
+            self._write(connection, rows)
+        for key, blob, _ in rows:
+            self._remember(key, blob, expires)
+        self._cull(connection)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        blob = self._dumps(value)
+        connection = self._connection()
+        with self._transaction(connection):
+            if self._load(connection, [key]):
+                return False
+            self._write(connection, [(key, blob, expires)])
+        self._remember(key, blob, expires)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        connection = self._connection()
+        with self._transaction(connection):
+            touched = connection.execute(
+                "UPDATE cache_entry SET expires = ? "
+                "WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (expires, key, time.time())).rowcount
+            self._log(connection, [key])
+        self._forget([key])
+        return bool(touched)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with self._transaction(connection):
+            entry = self._load(connection, [key]).get(key)
+            if entry is None:
+                raise ValueError("Key '%s' not found" % key)
+            blob, expires = entry
+            value = pickle.loads(blob) + delta
+            blob = self._dumps(value)
+            self._write(connection, [(key, blob, expires)])
+        self._remember(key, blob, expires)
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._get_many([key])
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if not keys:
+            return
+        connection = self._connection()
+        with self._transaction(connection):
+            connection.executemany("DELETE FROM cache_entry WHERE key = ?",
+                                   [(key,) for key in keys])
+            self._log(connection, keys)
+        self._forget(keys)
+
+    def clear(self):
+        connection = self._connection()
+        with self._transaction(connection):
+            connection.execute("DELETE FROM cache_entry")
+            self._log(connection, [CLEAR_ALL])
+        with self._lock:
+            self._local.clear()
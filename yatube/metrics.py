@@ -0,0 +1,259 @@
+"""Метрики запросов: заголовок Server-Timing и гистограммы для Prometheus.
+
+MetricsMiddleware собирает по запросу число и время SQL-запросов, время
+рендера шаблонов, попадания и промахи кэша и время генерации превью.
+Итоги складываются в гистограммы процесса с меткой view; раз в
+FLUSH_INTERVAL процесс кладёт их снимок в общий кэш, а /metrics суммирует
+снимки всех процессов.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+# Имя метрики -> (описание, границы корзин).
+HISTOGRAMS = {
+    "yatube_request_duration_seconds": (
+        "Время обработки запроса", DURATION_BUCKETS),
+    "yatube_sql_queries": ("SQL-запросов на запрос", QUERY_BUCKETS),
+    "yatube_sql_duration_seconds": (
+        "Время SQL-запросов на запрос", DURATION_BUCKETS),
+    "yatube_template_duration_seconds": (
+        "Время рендера шаблонов на запрос", DURATION_BUCKETS),
+    "yatube_thumbnail_duration_seconds": (
+        "Время генерации превью на запрос", DURATION_BUCKETS),
+}
+CACHE_COUNTER = "yatube_cache_requests_total"
+FLUSH_INTERVAL = 10
+PROCESSES_KEY = "metrics:processes"
+# Снимок завершившегося процесса со временем пропадает из суммы.
+SNAPSHOT_TIMEOUT = 60 * 10
+
+_current = ContextVar("metrics", default=None)
+
+
+class Timings:
+    """Счётчики одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.template = 0.0
+        self.template_depth = 0
+        self.thumbnail = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql += time.perf_counter() - started
+
+    def server_timing(self, total):
+        return ", ".join([
+            f'sql;dur={self.sql * 1000:.1f};desc="{self.queries} queries"',
+            f"tpl;dur={self.template * 1000:.1f}",
+            f"thumb;dur={self.thumbnail * 1000:.1f}",
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f"total;dur={total * 1000:.1f}",
+        ])
+
+
+def count_cache(hits, misses):
+    timings = _current.get()
+    if timings is not None:
+        timings.cache_hits += hits
+        timings.cache_misses += misses
+
+
+@contextmanager
+def timer(name):
+    """Добавляет время блока к полю name текущего запроса."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(timings, name,
+                getattr(timings, name) + time.perf_counter() - started)
+
+
+class Registry:
+    """Гистограммы процесса: (метрика, view) -> [корзины..., сумма]."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.flushed = 0.0
+
+    def observe(self, view, values, cache_hits, cache_misses):
+        with self.lock:
+            for name, value in values.items():
+                buckets = HISTOGRAMS[name][1]
+                state = self.histograms.get((name, view))
+                if state is None:
+                    # Корзины, +Inf и сумма.
+                    state = self.histograms[(name, view)] = \
+                        [0] * (len(buckets) + 1) + [0.0]
+                state[bisect_left(buckets, value)] += 1
+                state[-1] += value
+            for result, count in (("hit", cache_hits),
+                                  ("miss", cache_misses)):
+                if count:
+                    key = (CACHE_COUNTER, view, result)
+                    self.counters[key] = self.counters.get(key, 0) + count
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "histograms": {key: list(state) for key, state
+                               in self.histograms.items()},
+                "counters": dict(self.counters),
+            }
+
+    def flush(self, force=False):
+        """Снимок процесса в общий кэш, не чаще FLUSH_INTERVAL."""
+        now = time.monotonic()
+        if not force and now - self.flushed < FLUSH_INTERVAL:
+            return
+        self.flushed = now
+        key = f"metrics:{os.getpid()}"
+        cache.set(key, self.snapshot(), SNAPSHOT_TIMEOUT)
+        processes = cache.get(PROCESSES_KEY, [])
+        if key not in processes:
+            cache.set(PROCESSES_KEY, processes + [key], None)
+
+
+registry = Registry()
+
+
+def merged_snapshot():
+    """Сумма снимков всех живых процессов."""
+    registry.flush(force=True)
+    processes = cache.get(PROCESSES_KEY, [])
+    snapshots = cache.get_many(processes)
+    alive = [key for key in processes if key in snapshots]
+    if alive != processes:
+        cache.set(PROCESSES_KEY, alive, None)
+    histograms = {}
+    counters = {}
+    for snapshot in snapshots.values():
+        for key, state in snapshot["histograms"].items():
+            total = histograms.setdefault(key, [0] * len(state))
+            for index, value in enumerate(state):
+                total[index] += value
+        for key, value in snapshot["counters"].items():
+            counters[key] = counters.get(key, 0) + value
+    return histograms, counters
+
+
+def render_metrics(histograms, counters):
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (metric, view), state in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, "+Inf"), state):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f'{name}_sum{{view="{view}"}} {state[-1]}')
+            lines.append(f'{name}_count{{view="{view}"}} {cumulative}')
+    lines += [f"# HELP {CACHE_COUNTER} Обращения к кэшу",
+              f"# TYPE {CACHE_COUNTER} counter"]
+    for (_, view, result), value in sorted(counters.items()):
+        lines.append(f'{CACHE_COUNTER}{{view="{view}",result="{result}"}} '
+                     f'{value}')
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """Метрики в формате Prometheus (для METRICS_ALLOWED_IPS и staff)."""
+    allowed = getattr(settings, "METRICS_ALLOWED_IPS", [])
+    if request.META.get("REMOTE_ADDR") not in allowed \
+            and not request.user.is_staff:
+        raise Http404
+    return HttpResponse(render_metrics(*merged_snapshot()),
+                        content_type="text/plain; version=0.0.4")
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = Timings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings.sql_wrapper):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        # Неразрешённые адреса — одной меткой, чтобы не плодить серии.
+        view = match.view_name if match is not None else "unresolved"
+        registry.observe(view, {
+            "yatube_request_duration_seconds": total,
+            "yatube_sql_queries": timings.queries,
+            "yatube_sql_duration_seconds": timings.sql,
+            "yatube_template_duration_seconds": timings.template,
+            "yatube_thumbnail_duration_seconds": timings.thumbnail,
+        }, timings.cache_hits, timings.cache_misses)
+        registry.flush()
+        response["Server-Timing"] = timings.server_timing(total)
+        return response
+
+
+class TimedTemplate:
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None:
+            return self.template.render(context, request)
+        # Шаблоны внутри шаблонов (карточки) уже входят во внешний.
+        timings.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timings.template_depth -= 1
+            if not timings.template_depth:
+                timings.template += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, замеряющий время рендера для метрик."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
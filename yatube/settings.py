@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -40,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
+    'posts.querylog.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,7 +57,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендера для метрик.
+        'BACKEND': 'yatube.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -92,12 +96,57 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Тесты (manage.py test и pytest) не должны читать и очищать файл кэша
+# запущенного рядом сервера: у них свой кэш в памяти.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+# Кэш общий для всех процессов хоста: файл SQLite в режиме WAL и LRU с
+# коротким сроком в каждом процессе (см. yatube/cache.py).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.cache.SQLiteCache',
+        'LOCATION': ':memory:' if TESTING
+        else os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'LOCAL_TIMEOUT': 2,
+            'LOCAL_MAX_ENTRIES': 1000,
+        },
     }
 }
 
+# Источник ленты подписок: "timeline" — материализованные ленты
+# (после переключения на него запустите rebuild_timelines), "pull" — слияние
+# кэшированных списков постов авторов, "join" — прямой запрос к БД.
+FOLLOW_FEED_SOURCE = "timeline"
+
+# Ограничения загружаемых картинок. Проверяются по заголовку до
+# декодирования; оригиналы больше IMAGE_MAX_SIDE уменьшаются. У анимации
+# IMAGE_MAX_PIXELS — на все кадры вместе.
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 16_000_000
+IMAGE_MAX_SIDE = 2048
+
+# Адреса, с которых /metrics доступен без входа (сборщик Prometheus).
+# Пусто — только для staff: за обратным прокси на этой же машине все
+# запросы приходят с 127.0.0.1, так что локальный адрес сюда не годится.
+METRICS_ALLOWED_IPS = []
+
+# Журнал медленных SQL-запросов (posts/querylog.py): запросы дольше
+# порога (в секундах) пишутся в лог с планом, в таблице хранятся
+# SLOW_QUERY_KEEP недавних, в админке — SLOW_QUERY_TOP самых дорогих.
+SLOW_QUERY_LOG = False
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_TOP = 50
+SLOW_QUERY_KEEP = 1000
+
+# Побочные эффекты записи ставятся в очередь (таблица posts_job), её
+# разбирает manage.py run_workers. True — выполнять их сразу, без воркеров.
+JOBS_EAGER = False
+# Выполненные задачи с ключом хранятся, чтобы ключ не поставили повторно;
+# воркеры удаляют их через столько дней.
+JOBS_DONE_RETENTION_DAYS = 7
+
 LANGUAGE_CODE = 'ru'
 
 TIME_ZONE = 'UTC'